@@ -0,0 +1,249 @@
+import json
+import os
+import threading
+import time
+
+import requests
+
+from beatmap_table import BeatmapTable, np
+from fetch_engine import OSU_URL
+from sampler import CandidatePool
+
+# === CONFIG ===
+INDEX_FILE = "beatmap_index.json"
+SEARCH_URL = f"{OSU_URL}/api/v2/beatmapsets/search"
+ELIGIBLE_STATUSES = ("ranked", "loved", "qualified", "approved")
+# search endpoint status filters that cover ELIGIBLE_STATUSES ("ranked" includes approved)
+SEARCH_STATUSES = ("ranked", "loved", "qualified")
+REFRESH_PAGES = 20
+BOOTSTRAP_INTERVAL = 1.0
+REFRESH_INTERVAL = 6 * 60 * 60
+TABLE_REBUILD_INTERVAL = 5.0
+
+
+# === INDEX ===
+# Local index of known eligible beatmapsets:
+#   {set_id: {"status": str,
+#             "diffs": [[mode_int, difficulty_rating, beatmap_id, total_length, bpm], ...]}}
+# Built incrementally from beatmapset responses and bootstrapped in bulk from
+# pages of the search endpoint (per status, optionally per mode), persisted as
+# JSON next to the script. Sets seen while paging also go to `responses` (a
+# ResponseCache), so picking them later needs no request at all.
+class BeatmapIndex:
+    def __init__(self, path=INDEX_FILE, responses=None):
+        self.path = path
+        self.responses = responses
+        self.sets = {}
+        self.cursors = {}
+        self.updated = 0.0
+        self._lock = threading.Lock()
+        self._version = 0
+        self._candidates = {}
+        self._table = None
+        self._table_version = -1
+        self._table_built = 0.0
+        self._refreshing = False
+        self._refresher = None
+        self.load()
+
+    def __len__(self):
+        return len(self.sets)
+
+    def load(self):
+        if not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, "r") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return
+        with self._lock:
+            self.sets = {int(k): v for k, v in data.get("sets", {}).items()}
+            self.cursors = data.get("cursors", {})
+            self.updated = data.get("updated", 0.0)
+            self._version += 1
+
+    def save(self):
+        with self._lock:
+            data = {"updated": self.updated,
+                    "cursors": {k: dict(v) for k, v in self.cursors.items()},
+                    "sets": {str(k): v for k, v in self.sets.items()}}
+        tmp = self.path + ".tmp"
+        try:
+            with open(tmp, "w") as f:
+                json.dump(data, f, separators=(",", ":"))
+            os.replace(tmp, self.path)
+        except OSError:
+            pass
+
+    def add_set(self, data):
+        set_id = data.get("id")
+        if not set_id:
+            return
+        if data.get("status") not in ELIGIBLE_STATUSES:
+            self.discard(set_id)
+            return
+        diffs = [[b.get("mode_int"), b.get("difficulty_rating", 0), b.get("id"),
+                  b.get("total_length"), b.get("bpm")]
+                 for b in data.get("beatmaps", [])]
+        entry = {"status": data.get("status"), "diffs": diffs}
+        with self._lock:
+            if self.sets.get(set_id) != entry:
+                self.sets[set_id] = entry
+                self._version += 1
+
+    def entries(self, exclude=()):
+        # {set_id: entry} copy of the index, minus the IDs in exclude
+        with self._lock:
+            return {k: v for k, v in self.sets.items() if k not in exclude}
+
+    def merge(self, sets):
+        # entries learned elsewhere (e.g. by a search worker process)
+        with self._lock:
+            for set_id, entry in sets.items():
+                if self.sets.get(set_id) != entry:
+                    self.sets[set_id] = entry
+                    self._version += 1
+
+    def discard(self, set_id):
+        with self._lock:
+            if self.sets.pop(set_id, None) is not None:
+                self._version += 1
+
+    def table(self):
+        # columnar snapshot, rebuilt at most every TABLE_REBUILD_INTERVAL while
+        # the index keeps changing (a bootstrap adds thousands of sets a minute);
+        # the rebuild works on a copy so searches don't wait for it
+        with self._lock:
+            now = time.monotonic()
+            if self._table is not None and (self._table_version == self._version or
+                                            now - self._table_built < TABLE_REBUILD_INTERVAL):
+                return self._table
+            sets, version = dict(self.sets), self._version
+        table = BeatmapTable.from_sets(sets)
+        with self._lock:
+            if self._table is None or self._table_version != self._version:
+                self._table, self._table_version, self._table_built = table, version, now
+            return self._table
+
+    def _python_rows(self, modes, min_rating, max_rating):
+        rows = [(sid, d[2] if len(d) > 2 else None, d[1])
+                for sid, entry in self.sets.items() for d in entry["diffs"]
+                if d[0] in modes and min_rating <= (d[1] or 0) <= max_rating]
+        return tuple(zip(*rows)) or ((), (), ())
+
+    def pool(self, modes, min_rating, max_rating, by="set"):
+        # CandidatePool for the filter, cached until the table is rebuilt
+        key = (frozenset(modes), min_rating, max_rating, by)
+        table = self.table() if np is not None else None
+        stamp = self._table_built if table is not None else self._version
+        with self._lock:
+            cached = self._candidates.get(key)
+            if cached and cached[0] == stamp:
+                return cached[1]
+            if table is None:
+                rows = self._python_rows(modes, min_rating, max_rating)
+        if table is not None:
+            rows = table.rows(modes, min_rating, max_rating)
+        pool = CandidatePool(*rows, by=by)
+        with self._lock:
+            if len(self._candidates) > 16:
+                self._candidates.clear()
+            self._candidates[key] = (stamp, pool)
+        return pool
+
+    def sample(self, modes, min_rating, max_rating, by="set", history=None, cycle=True):
+        # (set_id, beatmap_id or None) from the known sets passing the filter,
+        # skipping sets in history; see CandidatePool for the modes and cycle
+        return self.pool(modes, min_rating, max_rating, by).draw(history, cycle)
+
+    # === REFRESH ===
+    def _page(self, tokens, params):
+        try:
+            res = tokens.authorized_get(SEARCH_URL, params=params, timeout=10)
+            if res is None:
+                return None
+            res.raise_for_status()
+            return res.json()
+        except (requests.RequestException, ValueError):
+            return None
+
+    def listing_state(self, status, mode=None):
+        # bootstrap checkpoint of one listing: {"cursor": str or None, "complete": bool}
+        key = status if mode is None else f"{status}:{mode}"
+        with self._lock:
+            return self.cursors.setdefault(key, {"cursor": None, "complete": False})
+
+    def walk_page(self, tokens, status, mode=None, cursor=None):
+        # one page (~50 sets) of a search listing: (next cursor, sets not indexed
+        # before) or None on error. Paging an unfinished listing from its stored
+        # cursor moves that cursor on.
+        params = {"s": status, "nsfw": "true"}
+        if mode is not None:
+            params["m"] = mode
+        if cursor:
+            params["cursor_string"] = cursor
+        data = self._page(tokens, params)
+        if data is None:
+            return None
+        found = data.get("beatmapsets", [])
+        with self._lock:
+            new = sum(1 for s in found if s.get("id") not in self.sets)
+        for s in found:
+            self.add_set(s)
+            if self.responses is not None:
+                self.responses.put(s)
+        next_cursor = data.get("cursor_string")
+        state = self.listing_state(status, mode)
+        if not state["complete"] and cursor == state["cursor"]:
+            state["cursor"] = next_cursor
+            state["complete"] = not next_cursor
+        return next_cursor, new
+
+    def _walk(self, tokens, status, mode, pages):
+        # Bootstrap: follow the stored cursor through the whole listing. Once a
+        # listing has been walked to the end, later refreshes only page from the
+        # newest sets until a page brings nothing new.
+        state = self.listing_state(status, mode)
+        cursor = None if state["complete"] else state["cursor"]
+        for _ in range(pages):
+            step = self.walk_page(tokens, status, mode, cursor)
+            if step is None:
+                return
+            cursor, new = step
+            if not cursor or (state["complete"] and not new):
+                return
+
+    def refresh(self, tokens, modes=None, pages=REFRESH_PAGES):
+        with self._lock:
+            if self._refreshing:
+                return
+            self._refreshing = True
+        try:
+            for status in SEARCH_STATUSES:
+                for mode in (sorted(modes) if modes else [None]):
+                    self._walk(tokens, status, mode, pages)
+            self.updated = time.time()
+            self.save()
+        finally:
+            with self._lock:
+                self._refreshing = False
+
+    def bootstrapped(self, modes=None):
+        return all(self.cursors.get(status if mode is None else f"{status}:{mode}", {}).get("complete")
+                   for status in SEARCH_STATUSES for mode in (sorted(modes) if modes else [None]))
+
+    def start_refresher(self, tokens, modes=None):
+        # background pool builder: pages quickly until every listing has been
+        # walked once, then tops the pool up every REFRESH_INTERVAL
+        with self._lock:
+            if self._refresher:
+                return
+            self._refresher = threading.Thread(target=self._refresh_loop, args=(tokens, modes),
+                                               daemon=True)
+        self._refresher.start()
+
+    def _refresh_loop(self, tokens, modes):
+        while True:
+            self.refresh(tokens, modes)
+            time.sleep(BOOTSTRAP_INTERVAL if not self.bootstrapped(modes) else REFRESH_INTERVAL)
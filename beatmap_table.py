@@ -0,0 +1,53 @@
+try:
+    import numpy as np
+except ImportError:  # optional: BeatmapIndex falls back to plain Python filtering
+    np = None
+
+# osu! "approved" codes for the statuses the index keeps
+STATUS_CODES = {"ranked": 1, "approved": 2, "qualified": 3, "loved": 4}
+
+
+# === TABLE ===
+# Columnar snapshot of the index, one row per difficulty, so mode / star /
+# status filters are a single vectorized mask instead of a Python loop.
+class BeatmapTable:
+    def __init__(self, rows):
+        data = np.array(rows, dtype=np.float64).reshape(-1, 7)
+        self.set_id = data[:, 0].astype(np.int64)
+        self.beatmap_id = data[:, 1].astype(np.int64)
+        self.mode_int = data[:, 2].astype(np.int8)
+        self.difficulty_rating = data[:, 3]
+        self.status = data[:, 4].astype(np.int8)
+        self.length = data[:, 5].astype(np.int32)
+        self.bpm = data[:, 6]
+
+    def __len__(self):
+        return len(self.set_id)
+
+    @classmethod
+    def from_sets(cls, sets):
+        # sets: BeatmapIndex.sets; diffs are [mode_int, rating, beatmap_id, length, bpm],
+        # older entries may only carry the first two
+        rows = []
+        for set_id, entry in sets.items():
+            code = STATUS_CODES.get(entry["status"], 0)
+            for d in entry["diffs"]:
+                mode_int, rating, beatmap_id, length, bpm = (list(d) + [0, 0, 0])[:5]
+                rows.append((set_id, beatmap_id or 0, mode_int, rating or 0,
+                             code, length or 0, bpm or 0))
+        return cls(rows)
+
+    def mask(self, modes, min_rating, max_rating, statuses=None):
+        m = np.zeros(256, dtype=bool)
+        m[list(modes)] = True
+        m = m[self.mode_int.view(np.uint8)]
+        m &= self.difficulty_rating >= min_rating
+        m &= self.difficulty_rating <= max_rating
+        if statuses:
+            m &= np.isin(self.status, [STATUS_CODES[s] for s in statuses])
+        return m
+
+    def rows(self, modes, min_rating, max_rating, statuses=None):
+        # (set_id, beatmap_id, rating) columns of the matching difficulties, as arrays
+        m = self.mask(modes, min_rating, max_rating, statuses)
+        return self.set_id[m], self.beatmap_id[m], self.difficulty_rating[m]
@@ -0,0 +1,124 @@
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from mock_osu_server import MockData, MockOsuServer
+
+
+def percentile(values, p):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    k = (len(values) - 1) * p / 100.0
+    lo = int(k)
+    hi = min(lo + 1, len(values) - 1)
+    return values[lo] + (values[hi] - values[lo]) * (k - lo)
+
+
+def make_limiter(window, per_minute):
+    from rate_limit import RateLimiter
+    if window == "adaptive":
+        return RateLimiter(per_minute=per_minute)
+    w = int(window)
+    return RateLimiter(per_minute=per_minute, min_limit=w, max_limit=w, start=w)
+
+
+def run_scenario(srv, args, strategy, window):
+    # fresh limiter, caches and index per scenario so runs don't leak into each other
+    import fetch_engine
+    import orb_search
+    fetch_engine.api_limiter = make_limiter(window, args.rate_per_minute)
+    flt = orb_search.SearchFilter(args.modes.split(","), args.min_stars, args.max_stars)
+    index_tries = orb_search.INDEX_TRIES
+    with tempfile.TemporaryDirectory() as data_dir:
+        searcher = orb_search.Searcher("mock", "mock", data_dir=data_dir)
+        searcher.get_osu_token()
+        srv.reset_counts()
+        start = time.perf_counter()
+        if strategy == "index":
+            # its requests are part of what the index costs
+            searcher.index.refresh(searcher.tokens, pages=args.bootstrap_pages)
+        else:
+            # every search probes random IDs, never the sets earlier rounds indexed
+            orb_search.INDEX_TRIES = 0
+        latencies = []
+        hits = 0
+        try:
+            for _ in range(args.searches):
+                t = time.perf_counter()
+                r = searcher.get_random_map(flt)
+                if r and args.thumbs:
+                    searcher.fetch_thumbnail(r.thumb)
+                latencies.append(time.perf_counter() - t)
+                hits += r is not None
+        finally:
+            orb_search.INDEX_TRIES = index_tries
+        elapsed = time.perf_counter() - start
+        counts = srv.reset_counts()
+    requests_made = sum(v for k, v in counts.items()
+                        if k in ("beatmapset", "search", "replay", "token"))
+    return {
+        "strategy": strategy, "window": window, "searches": args.searches, "hits": hits,
+        "p50_ms": percentile(latencies, 50) * 1000, "p95_ms": percentile(latencies, 95) * 1000,
+        "p99_ms": percentile(latencies, 99) * 1000,
+        "requests_per_hit": requests_made / hits if hits else float('inf'),
+        "requests_per_s": requests_made / elapsed if elapsed else 0.0,
+        "throttled": counts.get("429", 0),
+        "final_window": fetch_engine.api_limiter.window,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Benchmark get_random_map against a local mock osu! API.")
+    parser.add_argument("--searches", type=int, default=50)
+    parser.add_argument("--strategies", default="random,index",
+                        help="random: random IDs only, no index picks; "
+                             "index: bootstrap the local index first (its requests count)")
+    parser.add_argument("--windows", default="adaptive,5,15,30",
+                        help="in-flight windows to compare; 'adaptive' is the AIMD limiter")
+    parser.add_argument("--rate-per-minute", type=float, default=1200)
+    parser.add_argument("--bootstrap-pages", type=int, default=5)
+    parser.add_argument("--hit-ratio", type=float, default=0.05)
+    parser.add_argument("--missing-ratio", type=float, default=0.5)
+    parser.add_argument("--skew", type=float, default=0.0,
+                        help="hit density falls off with ID (0: uniform)")
+    parser.add_argument("--latency", default="uniform:0.03:0.15")
+    parser.add_argument("--rate-429", type=float, default=0.0)
+    parser.add_argument("--replay", help="JSON lines of recorded responses to serve")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--modes", default="osu,taiko,fruits,mania")
+    parser.add_argument("--min-stars", type=float, default=0.0)
+    parser.add_argument("--max-stars", type=float, default=float('inf'))
+    parser.add_argument("--thumbs", action="store_true", help="also fetch each result's cover")
+    parser.add_argument("--json", action="store_true", help="print one JSON object per scenario")
+    args = parser.parse_args(argv)
+
+    srv = MockOsuServer(data=MockData(args.hit_ratio, args.missing_ratio, args.seed, skew=args.skew),
+                        latency=args.latency, rate_429=args.rate_429, replay=args.replay).start()
+    # must be set before the app modules are imported
+    os.environ["OSU_BASE_URL"] = srv.base_url
+
+    if not args.json:
+        print(f"{'strategy':<8} {'window':>8} {'hits':>5} {'p50 ms':>8} {'p95 ms':>8} "
+              f"{'p99 ms':>8} {'req/hit':>8} {'req/s':>7} {'429s':>5}")
+    for strategy in args.strategies.split(","):
+        for window in args.windows.split(","):
+            row = run_scenario(srv, args, strategy, window)
+            if args.json:
+                print(json.dumps(row), flush=True)
+            else:
+                print(f"{row['strategy']:<8} {row['window']:>8} {row['hits']:>5} "
+                      f"{row['p50_ms']:>8.1f} {row['p95_ms']:>8.1f} {row['p99_ms']:>8.1f} "
+                      f"{row['requests_per_hit']:>8.2f} {row['requests_per_s']:>7.1f} "
+                      f"{row['throttled']:>5}", flush=True)
+    srv.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,238 @@
+import argparse
+import json
+import random
+import re
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+# === CONFIG ===
+MAX_ID = 3000000
+PAGE_SIZE = 50
+STATUS_INT = {"ranked": 1, "approved": 2, "qualified": 3, "loved": 4}
+ELIGIBLE = ("ranked", "ranked", "ranked", "ranked", "loved", "qualified", "approved")
+INELIGIBLE = ("graveyard", "graveyard", "graveyard", "wip", "pending")
+
+
+def parse_latency(spec):
+    # "0", "const:0.05", "uniform:0.02:0.2" or "lognormal:mu:sigma" (seconds)
+    kind, *args = spec.split(":")
+    if kind in ("0", ""):
+        return lambda: 0.0
+    args = [float(a) for a in args]
+    if kind == "const":
+        return lambda: args[0]
+    if kind == "uniform":
+        return lambda: random.uniform(args[0], args[1])
+    if kind == "lognormal":
+        return lambda: random.lognormvariate(args[0], args[1])
+    raise ValueError(f"unknown latency spec {spec!r}")
+
+
+# === SYNTHETIC DATA ===
+# Each ID's fate is a pure function of (seed, id), so runs are reproducible and
+# the search endpoint and the per-set endpoint always agree. skew > 0 makes low
+# IDs denser in hits, like the real ID space, keeping hit_ratio as the average.
+class MockData:
+    def __init__(self, hit_ratio=0.05, missing_ratio=0.5, seed=1, max_id=MAX_ID, skew=0.0):
+        self.hit_ratio = hit_ratio
+        self.skew = skew
+        self.missing_ratio = missing_ratio
+        self.seed = seed
+        self.max_id = max_id
+
+    def _u(self, set_id, salt):
+        h = (set_id * 2654435761 + self.seed * 40503 + salt * 97) & 0xffffffff
+        h = ((h ^ (h >> 16)) * 0x45d9f3b) & 0xffffffff
+        return ((h ^ (h >> 16)) & 0xffffffff) / 2 ** 32
+
+    def status(self, set_id):
+        if not 0 < set_id <= self.max_id:
+            return None
+        density = self.hit_ratio * (1 + self.skew) * (1 - set_id / self.max_id) ** self.skew
+        if self._u(set_id, 1) < density:
+            return ELIGIBLE[int(self._u(set_id, 2) * len(ELIGIBLE))]
+        if self._u(set_id, 3) < self.missing_ratio:
+            return None
+        return INELIGIBLE[int(self._u(set_id, 4) * len(INELIGIBLE))]
+
+    def beatmapset(self, set_id, base_url):
+        status = self.status(set_id)
+        if status is None:
+            return None
+        rng = random.Random(set_id * 7919 + self.seed)
+        beatmaps = []
+        for i in range(rng.randint(1, 8)):
+            mode_int = rng.choice((0, 0, 0, 0, 1, 2, 3))
+            beatmaps.append({"id": set_id * 10 + i, "beatmapset_id": set_id, "mode_int": mode_int,
+                             "mode": ("osu", "taiko", "fruits", "mania")[mode_int],
+                             "difficulty_rating": round(rng.uniform(0.5, 9.5), 2),
+                             "status": status, "total_length": rng.randint(30, 600),
+                             "bpm": rng.choice((120, 150, 160, 175, 180, 200, 220)),
+                             "version": f"Diff {i}"})
+        cover = f"{base_url}/beatmaps/{set_id}/covers/cover@2x.jpg?{set_id}"
+        return {"id": set_id, "title": f"Mock Song {set_id}", "artist": f"Mock Artist {set_id % 977}",
+                "creator": "mock", "status": status, "ranked": STATUS_INT.get(status, -2),
+                "covers": {"cover": cover, "cover@2x": cover}, "description": "x" * 2000,
+                "beatmaps": beatmaps}
+
+    def search(self, status, mode, cursor, base_url):
+        # newest first, like the real listing; cursor_string is the last ID returned
+        wanted = {"ranked": ("ranked", "approved")}.get(status, (status,))
+        set_id = int(cursor) if cursor else self.max_id + 1
+        found = []
+        while len(found) < PAGE_SIZE and set_id > 1:
+            set_id -= 1
+            if self.status(set_id) not in wanted:
+                continue
+            s = self.beatmapset(set_id, base_url)
+            if mode is not None and all(b["mode_int"] != mode for b in s["beatmaps"]):
+                continue
+            found.append(s)
+        return {"beatmapsets": found, "total": None,
+                "cursor_string": str(set_id) if set_id > 1 else None}
+
+
+# === SERVER ===
+class MockOsuServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, port=0, data=None, latency="0", rate_429=0.0, retry_after=1,
+                 replay=None, cover_bytes=b"\xff\xd8mock-cover\xff\xd9"):
+        super().__init__(("127.0.0.1", port), MockHandler)
+        self.data = data or MockData()
+        self.latency = parse_latency(latency)
+        self.rate_429 = rate_429
+        self.retry_after = retry_after
+        self.cover_bytes = cover_bytes
+        self.replay = {}
+        if replay:
+            with open(replay, "r") as f:
+                for line in f:
+                    rec = json.loads(line)
+                    self.replay[rec["path"]] = (rec["status"], rec.get("body"))
+        self._lock = threading.Lock()
+        self.counts = {}
+
+    def handle_error(self, request, client_address):
+        # cancelled searches abort their straggler requests on purpose
+        if isinstance(sys.exc_info()[1], (BrokenPipeError, ConnectionResetError)):
+            return
+        super().handle_error(request, client_address)
+
+    @property
+    def base_url(self):
+        return f"http://127.0.0.1:{self.server_port}"
+
+    def count(self, kind):
+        with self._lock:
+            self.counts[kind] = self.counts.get(kind, 0) + 1
+
+    def reset_counts(self):
+        with self._lock:
+            counts, self.counts = self.counts, {}
+        return counts
+
+    def start(self):
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+
+class MockHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, *args):
+        pass
+
+    def _send(self, status, body=None, headers=None, raw=None):
+        payload = raw if raw is not None else (json.dumps(body).encode() if body is not None else b"")
+        self.send_response(status)
+        self.send_header("Content-Type", "image/jpeg" if raw is not None else "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        for k, v in (headers or {}).items():
+            self.send_header(k, v)
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def _throttled(self):
+        srv = self.server
+        if srv.rate_429 and random.random() < srv.rate_429:
+            srv.count("429")
+            self._send(429, {"error": "Too Many Attempts."}, {"Retry-After": str(srv.retry_after)})
+            return True
+        return False
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        self.rfile.read(length)
+        if urlparse(self.path).path != "/oauth/token":
+            return self._send(404, {"error": "not found"})
+        self.server.count("token")
+        time.sleep(self.server.latency())
+        self._send(200, {"token_type": "Bearer", "expires_in": 86400, "access_token": "mock-token"})
+
+    def do_GET(self):
+        srv = self.server
+        url = urlparse(self.path)
+        time.sleep(srv.latency())
+        if url.path.startswith("/beatmaps/") and "/covers/" in url.path:
+            srv.count("cover")
+            etag = f'"{url.path}"'
+            if self.headers.get("If-None-Match") == etag:
+                return self._send(304, headers={"ETag": etag})
+            return self._send(200, headers={"ETag": etag}, raw=srv.cover_bytes)
+        if not url.path.startswith("/api/v2/"):
+            return self._send(404, {"error": "not found"})
+        if self.headers.get("Authorization") != "Bearer mock-token":
+            return self._send(401, {"authentication": "basic"})
+        if url.path in srv.replay:
+            srv.count("replay")
+            status, body = srv.replay[url.path]
+            return self._send(status, body)
+        if url.path == "/api/v2/beatmapsets/search":
+            srv.count("search")
+            if self._throttled():
+                return
+            q = parse_qs(url.query)
+            mode = q.get("m", [None])[0]
+            return self._send(200, srv.data.search(q.get("s", ["ranked"])[0],
+                                                   int(mode) if mode is not None else None,
+                                                   q.get("cursor_string", [None])[0], srv.base_url))
+        m = re.fullmatch(r"/api/v2/beatmapsets/(\d+)", url.path)
+        if m:
+            srv.count("beatmapset")
+            if self._throttled():
+                return
+            s = srv.data.beatmapset(int(m.group(1)), srv.base_url)
+            if s is None:
+                srv.count("beatmapset_404")
+                return self._send(404, {"error": None})
+            return self._send(200, s)
+        self._send(404, {"error": "not found"})
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Local stand-in for the osu! API v2.")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--hit-ratio", type=float, default=0.05)
+    parser.add_argument("--missing-ratio", type=float, default=0.5)
+    parser.add_argument("--skew", type=float, default=0.0, help="hit density falls off with ID")
+    parser.add_argument("--latency", default="uniform:0.03:0.15")
+    parser.add_argument("--rate-429", type=float, default=0.0)
+    parser.add_argument("--replay", help="JSON lines of {path, status, body} served verbatim")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args(argv)
+    srv = MockOsuServer(args.port, MockData(args.hit_ratio, args.missing_ratio, args.seed,
+                                            skew=args.skew),
+                        args.latency, args.rate_429, replay=args.replay)
+    print(f"mock osu! API on {srv.base_url} (set OSU_BASE_URL to use it)")
+    try:
+        srv.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,45 @@
+import argparse
+import json
+import os
+import random
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from orb_search import API_URL, load_credentials
+from osu_token import TokenManager
+
+
+# Records real /beatmapsets/{id} responses as JSON lines that
+# mock_osu_server.py --replay (and bench_search.py --replay) serve verbatim.
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Record osu! API beatmapset responses for replay.")
+    parser.add_argument("output")
+    parser.add_argument("-n", "--count", type=int, default=100, help="random IDs to record")
+    parser.add_argument("--ids", help="comma-separated set IDs instead of random ones")
+    parser.add_argument("--max-id", type=int, default=3000000)
+    args = parser.parse_args(argv)
+
+    cid, secret = load_credentials()
+    tokens = TokenManager(cid, secret)
+    if not tokens.get():
+        print("Failed to get API token", file=sys.stderr)
+        return 1
+    ids = ([int(i) for i in args.ids.split(",")] if args.ids else
+           [random.randint(1, args.max_id) for _ in range(args.count)])
+    with open(args.output, "a") as f:
+        for set_id in ids:
+            res = tokens.authorized_get(f"{API_URL}/beatmapsets/{set_id}", timeout=10)
+            if res is None:
+                continue
+            try:
+                body = res.json()
+            except ValueError:
+                body = None
+            f.write(json.dumps({"path": f"/api/v2/beatmapsets/{set_id}",
+                                "status": res.status_code, "body": body}) + "\n")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
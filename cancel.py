@@ -0,0 +1,137 @@
+import socket
+import threading
+from contextlib import contextmanager
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+
+_local = threading.local()
+
+
+class Cancelled(requests.RequestException):
+    pass
+
+
+def current():
+    # token bound to the calling thread, if any
+    return getattr(_local, "token", None)
+
+
+def _abort(conn):
+    # shutting the socket down wakes a thread blocked in connect/recv on it;
+    # urllib3 then discards the connection instead of returning it to the pool
+    sock = getattr(conn, "sock", None)
+    if sock is not None:
+        try:
+            sock.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+
+
+# === TOKEN ===
+# Per-search cancellation. Requests made while a token is bound to the thread
+# register their pooled connection with it, so cancel() aborts them at once
+# instead of waiting for the timeout. Child tokens are cancelled with their parent.
+class CancelToken:
+    def __init__(self, parent=None):
+        self._event = threading.Event()
+        self._lock = threading.Lock()
+        self._conns = set()
+        self._children = set()
+        self._parent = parent
+        if parent is not None:
+            parent._adopt(self)
+
+    @property
+    def cancelled(self):
+        return self._event.is_set()
+
+    def child(self):
+        return CancelToken(self)
+
+    def _adopt(self, child):
+        with self._lock:
+            if not self._event.is_set():
+                self._children.add(child)
+                return
+        child.cancel()
+
+    def cancel(self):
+        with self._lock:
+            if self._event.is_set():
+                return
+            self._event.set()
+            conns, self._conns = self._conns, set()
+            children, self._children = self._children, set()
+        for conn in conns:
+            _abort(conn)
+        for child in children:
+            child.cancel()
+        if self._parent is not None:
+            with self._parent._lock:
+                self._parent._children.discard(self)
+
+    def check(self):
+        if self._event.is_set():
+            raise Cancelled()
+
+    def wait(self, timeout):
+        # sleep that returns early (True) once cancelled
+        return self._event.wait(timeout)
+
+    def track(self, conn):
+        with self._lock:
+            if not self._event.is_set():
+                if len(self._conns) > 64:
+                    # connections urllib3 discarded after an error never come back
+                    self._conns = {c for c in self._conns if getattr(c, "sock", None)}
+                self._conns.add(conn)
+                return
+        _abort(conn)
+
+    def untrack(self, conn):
+        with self._lock:
+            self._conns.discard(conn)
+
+    @contextmanager
+    def bound(self):
+        previous = current()
+        _local.token = self
+        try:
+            yield self
+        finally:
+            _local.token = previous
+
+
+# === CONNECTION TRACKING ===
+class _TrackingMixin:
+    def _get_conn(self, timeout=None):
+        conn = super()._get_conn(timeout)
+        token = current()
+        if token is not None:
+            conn.cancel_token = token
+            token.track(conn)
+        return conn
+
+    def _put_conn(self, conn):
+        token = getattr(conn, "cancel_token", None)
+        if token is not None:
+            conn.cancel_token = None
+            token.untrack(conn)
+        super()._put_conn(conn)
+
+
+class TrackingHTTPConnectionPool(_TrackingMixin, HTTPConnectionPool):
+    pass
+
+
+class TrackingHTTPSConnectionPool(_TrackingMixin, HTTPSConnectionPool):
+    pass
+
+
+class CancellableAdapter(HTTPAdapter):
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {"http": TrackingHTTPConnectionPool,
+                                                   "https": TrackingHTTPSConnectionPool}
@@ -0,0 +1,112 @@
+import threading
+import time
+from datetime import date, datetime, timedelta
+
+from beatmap_index import REFRESH_INTERVAL, REFRESH_PAGES, SEARCH_STATUSES
+from metrics import metrics
+
+# === CONFIG ===
+DAILY_BUDGET = 1000          # listing pages (~50 sets each) per day
+PAGE_INTERVAL = 2.0
+IDLE_POLL = 0.5
+CHECKPOINT_INTERVAL = 60.0
+RETRY_INTERVAL = 30.0
+
+
+def _until_tomorrow():
+    midnight = datetime.combine(date.today() + timedelta(days=1), datetime.min.time())
+    return max(1.0, midnight.timestamp() - time.time())
+
+
+# === CRAWLER ===
+# Low-priority, budgeted counterpart of BeatmapIndex.start_refresher for the
+# GUI. It pages the search listings only while no other API request is in
+# flight, and at most DAILY_BUDGET pages a day; the ledger lives in the session
+# store, so restarting doesn't reset it. Unfinished listings resume from the
+# bootstrap cursors the index persists, and everything learned (index, response
+# cache, history, ...) is checkpointed with Searcher.save() every
+# CHECKPOINT_INTERVAL, so a restart loses at most that much. Once every listing
+# is complete it only tops up new sets every REFRESH_INTERVAL.
+class Crawler:
+    def __init__(self, searcher, budget=DAILY_BUDGET):
+        self.searcher = searcher
+        self.session = searcher.session
+        self.budget = budget
+        self._thread = None
+        self._lock = threading.Lock()
+        self._dirty = False
+        self._checkpointed = time.monotonic()
+
+    def start(self, modes=None):
+        with self._lock:
+            if self._thread:
+                return
+            self._thread = threading.Thread(target=self._run, args=(modes,), name="crawler",
+                                            daemon=True)
+        self._thread.start()
+
+    def spent_today(self):
+        ledger = self.session.get("crawl_ledger", {})
+        return ledger.get("spent", 0) if ledger.get("day") == date.today().isoformat() else 0
+
+    def _spend(self):
+        # one page from today's budget; False once it is used up
+        spent = self.spent_today()
+        if spent >= self.budget:
+            return False
+        self.session.put("crawl_ledger", {"day": date.today().isoformat(), "spent": spent + 1})
+        return True
+
+    def _wait_idle(self):
+        # searches always go first
+        limiter = self.searcher.engine.limiter
+        while limiter.in_flight:
+            time.sleep(IDLE_POLL)
+
+    def _checkpoint(self, force=False):
+        if self._dirty and (force or time.monotonic() - self._checkpointed >= CHECKPOINT_INTERVAL):
+            self.searcher.save()
+            self._dirty = False
+            self._checkpointed = time.monotonic()
+
+    def _page(self, status, mode, cursor):
+        # (next cursor, new sets) or None after an error
+        while not self.searcher.get_osu_token():
+            time.sleep(RETRY_INTERVAL)
+        while not self._spend():
+            self._checkpoint(force=True)
+            time.sleep(_until_tomorrow())
+        self._wait_idle()
+        step = self.searcher.index.walk_page(self.searcher.tokens, status, mode, cursor)
+        metrics.inc("crawl_pages_total", outcome="error" if step is None else "ok")
+        self._dirty = True
+        self._checkpoint()
+        time.sleep(PAGE_INTERVAL if step is not None else RETRY_INTERVAL)
+        return step
+
+    def _run(self, modes):
+        index = self.searcher.index
+        listings = [(status, mode) for status in SEARCH_STATUSES
+                    for mode in (sorted(modes) if modes else [None])]
+        while True:
+            if not index.bootstrapped(modes):
+                for status, mode in listings:
+                    state = index.listing_state(status, mode)
+                    while not state["complete"]:
+                        self._page(status, mode, state["cursor"])
+                continue
+            wait = self.session.get("crawl_topped_up", 0) + REFRESH_INTERVAL - time.time()
+            if wait > 0:
+                self._checkpoint(force=True)
+                time.sleep(wait)
+                continue
+            for status, mode in listings:
+                cursor = None
+                for _ in range(REFRESH_PAGES):
+                    step = self._page(status, mode, cursor)
+                    if step is None:
+                        break
+                    cursor, new = step
+                    if not cursor or not new:
+                        break
+            self.session.put("crawl_topped_up", time.time())
@@ -0,0 +1,109 @@
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+
+import requests
+
+from cancel import CancellableAdapter, Cancelled, current
+from metrics import metrics
+from rate_limit import RateLimiter, retry_after
+
+# === CONFIG ===
+# OSU_BASE_URL points the app at another server, e.g. the benchmark's mock API
+OSU_URL = os.environ.get("OSU_BASE_URL", "https://osu.ppy.sh").rstrip("/")
+POOL_SIZE = 32
+POLL_INTERVAL = 0.25
+MAX_429_RETRIES = 2
+
+# === SESSION ===
+# One keep-alive connection pool shared by every API, search and cover request,
+# so back-to-back searches reuse TLS connections instead of opening new ones.
+# The adapter lets a CancelToken abort the connections its requests are using.
+session = requests.Session()
+session.mount("https://", CancellableAdapter(pool_connections=4, pool_maxsize=POOL_SIZE))
+session.mount("http://", CancellableAdapter(pool_connections=4, pool_maxsize=POOL_SIZE))
+# Every osu! API call goes through this limiter; cover images are not rate limited.
+api_limiter = RateLimiter()
+
+
+def warm_up(url=OSU_URL):
+    # opens a keep-alive connection to the API host ahead of the first request;
+    # not rate limited, the response is discarded
+    try:
+        session.head(url, timeout=5).close()
+    except requests.RequestException:
+        pass
+
+
+def api_request(method, url, **kwargs):
+    # a 429 is waited out (Retry-After) and retried instead of surfacing as a miss;
+    # raises Cancelled once the CancelToken bound to this thread is cancelled
+    cancel = current()
+    for attempt in range(MAX_429_RETRIES + 1):
+        if not api_limiter.acquire(cancel):
+            raise Cancelled()
+        start = time.monotonic()
+        res = None
+        try:
+            res = session.request(method, url, **kwargs)
+        finally:
+            latency = time.monotonic() - start
+            if res is None:
+                aborted = cancel is not None and cancel.cancelled
+                api_limiter.release(latency, aborted=aborted)
+                metrics.inc("api_requests_total", status="aborted" if aborted else "error")
+            else:
+                api_limiter.release(latency, res.status_code, retry_after(res),
+                                    res.headers.get("X-RateLimit-Remaining"))
+                metrics.inc("api_requests_total", status=str(res.status_code))
+                metrics.observe("api_request_seconds", latency)
+        if res.status_code != 429 or attempt == MAX_429_RETRIES:
+            return res
+        res.close()
+
+
+# === ENGINE ===
+class FetchEngine:
+    def __init__(self, limiter=None):
+        self.limiter = limiter or api_limiter
+        self._executor = ThreadPoolExecutor(max_workers=self.limiter.max_limit,
+                                            thread_name_prefix="fetch")
+
+    def first_hit(self, fetch, next_id, cancel):
+        # the first truthy fetch(next_id()) result; whatever is still queued or in
+        # flight afterwards is cancelled, aborting its connection
+        with metrics.span("first_hit") as span:
+            hits = self.hits(fetch, next_id, cancel)
+            try:
+                r = next(hits, None)
+            finally:
+                hits.close()
+            span.outcome = "hit" if r else "cancelled"
+            return r
+
+    def hits(self, fetch, next_id, cancel):
+        # keeps up to limiter.window fetch(next_id()) calls running and yields every
+        # truthy result as it completes, until cancel is cancelled or the generator
+        # is closed; closing it cancels the calls still queued or in flight
+        round_token = cancel.child()
+
+        def run(set_id):
+            with round_token.bound():
+                return fetch(set_id)
+
+        pending = set()
+        try:
+            while not round_token.cancelled:
+                while len(pending) < self.limiter.window:
+                    pending.add(self._executor.submit(run, next_id()))
+                    metrics.inc("first_hit_ids_total")
+                done, pending = wait(pending, timeout=POLL_INTERVAL,
+                                     return_when=FIRST_COMPLETED)
+                for f in done:
+                    r = f.result()
+                    if r:
+                        yield r
+        finally:
+            for f in pending:
+                f.cancel()
+            round_token.cancel()
@@ -0,0 +1,127 @@
+import json
+import os
+import threading
+import time
+
+# === CONFIG ===
+CACHE_FILE = "invalid_ids.bin"
+MAX_ID = 3000000
+DRAW_TRIES = 64          # random-ID draws before an invalid one is probed anyway
+DAY = 24 * 60 * 60
+# tier -> how long a mark lives; None never expires
+TIERS = {
+    "missing": None,        # 404 below the highest set ID seen so far (deleted sets)
+    "long": 30 * DAY,       # graveyard, and 404s above the high-water mark (not created yet)
+    "short": 2 * DAY,       # pending / wip, which may become qualified soon
+}
+STATUS_TIERS = {"graveyard": "long", "pending": "short", "wip": "short"}
+
+
+# === BITMAP ===
+# Negative cache over the 1..MAX_ID beatmapset ID space. Each tier with an
+# expiry keeps two bitmaps (current and previous generation); every ttl/2 the
+# previous one is dropped, so a mark lives between ttl/2 and ttl.
+class InvalidIdCache:
+    def __init__(self, path=CACHE_FILE, max_id=MAX_ID):
+        self.path = path
+        self.max_id = max_id
+        self.high_water = 0
+        self._size = max_id // 8 + 1
+        self._lock = threading.Lock()
+        self._bits = {}
+        self._rotated = {}
+        now = time.time()
+        for tier, ttl in TIERS.items():
+            gens = 1 if ttl is None else 2
+            self._bits[tier] = [bytearray(self._size) for _ in range(gens)]
+            self._rotated[tier] = now
+        self.load()
+
+    def load(self):
+        if not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, "rb") as f:
+                header = json.loads(f.readline())
+                if header.get("max_id") != self.max_id:
+                    return
+                bits = {}
+                for tier in TIERS:
+                    bits[tier] = [bytearray(f.read(self._size)) for _ in self._bits[tier]]
+                    if any(len(b) != self._size for b in bits[tier]):
+                        return
+        except (OSError, ValueError):
+            return
+        with self._lock:
+            self._bits = bits
+            self._rotated.update(header.get("rotated", {}))
+            self.high_water = header.get("high_water", 0)
+
+    def save(self):
+        with self._lock:
+            header = {"max_id": self.max_id, "high_water": self.high_water,
+                      "rotated": dict(self._rotated)}
+            blobs = [bytes(b) for tier in TIERS for b in self._bits[tier]]
+        tmp = self.path + ".tmp"
+        try:
+            with open(tmp, "wb") as f:
+                f.write(json.dumps(header).encode() + b"\n")
+                for blob in blobs:
+                    f.write(blob)
+            os.replace(tmp, self.path)
+        except OSError:
+            pass
+
+    def snapshot(self):
+        # (bitmaps, high_water), picklable, e.g. to hand a worker's findings back
+        with self._lock:
+            return {t: [bytes(b) for b in gens] for t, gens in self._bits.items()}, self.high_water
+
+    def merge(self, bits, high_water=0):
+        # ORs in another cache's snapshot() generation by generation
+        with self._lock:
+            for tier, gens in bits.items():
+                for i, theirs in enumerate(gens[:len(self._bits[tier])]):
+                    mine = self._bits[tier][i]
+                    merged = int.from_bytes(mine, "little") | int.from_bytes(theirs, "little")
+                    self._bits[tier][i] = bytearray(merged.to_bytes(self._size, "little"))
+            self.high_water = max(self.high_water, high_water)
+
+    def _rotate(self):
+        now = time.time()
+        for tier, ttl in TIERS.items():
+            if ttl is None or now - self._rotated[tier] < ttl / 2:
+                continue
+            gens = self._bits[tier]
+            gens[1] = gens[0] if now - self._rotated[tier] < ttl else bytearray(self._size)
+            gens[0] = bytearray(self._size)
+            self._rotated[tier] = now
+
+    def _mark(self, set_id, tier):
+        if not 0 < set_id <= self.max_id:
+            return
+        with self._lock:
+            self._rotate()
+            self._bits[tier][0][set_id >> 3] |= 1 << (set_id & 7)
+
+    def is_invalid(self, set_id):
+        byte, bit = set_id >> 3, 1 << (set_id & 7)
+        with self._lock:
+            # expiry is checked on reads too, as a cache that only gets looked
+            # up would otherwise never drop a generation
+            self._rotate()
+            return any(b[byte] & bit for gens in self._bits.values() for b in gens)
+
+    # === RECORDING ===
+    def observe(self, set_id):
+        # any real beatmapset proves IDs below it have been handed out
+        if set_id and set_id > self.high_water:
+            self.high_water = set_id
+
+    def mark_missing(self, set_id):
+        self._mark(set_id, "missing" if set_id <= self.high_water else "long")
+
+    def mark_status(self, set_id, status):
+        tier = STATUS_TIERS.get(status)
+        if tier:
+            self._mark(set_id, tier)
@@ -0,0 +1,132 @@
+import bisect
+import json
+import os
+import random
+import threading
+from collections import OrderedDict
+
+# === CONFIG ===
+DENSITY_FILE = "id_density.json"
+MAX_ID = 3000000
+BUCKET_SIZE = 10000
+PRIOR_TRIALS = 20       # weight of the prior (all-filter eligibility) in each bucket estimate
+UNIFORM_SHARE = 0.5     # part of the proposal that stays uniform, bounds the rejection rate
+TEMPER = 0.5            # proposal follows density ** TEMPER, not density itself
+REBUILD_EVERY = 32
+MAX_FILTERS = 32
+ELIGIBLE_KEY = "*"
+
+
+def filter_key(flt):
+    return f"{','.join(sorted(flt.modes))}:{flt.min_rating:g}:{flt.max_rating:g}"
+
+
+# === SAMPLER ===
+# Learns, per ID bucket and per filter, how often a probed beatmapset ID turns
+# out to be a hit, and proposes IDs from buckets in proportion to a tempered
+# estimate of that density (plus a uniform share). Every proposal carries an
+# acceptance probability q_min / q(bucket): accepting hits with it makes each
+# eligible set equally likely to be returned, exactly as with uniform probing,
+# while the extra hits found in dense ranges still land in the index and the
+# response cache for later searches.
+class AdaptiveIdSampler:
+    def __init__(self, path=DENSITY_FILE, max_id=MAX_ID, bucket_size=BUCKET_SIZE):
+        self.path = path
+        self.max_id = max_id
+        self.bucket_size = bucket_size
+        self.buckets = -(-max_id // bucket_size)
+        self._lock = threading.Lock()
+        # key -> [hits per bucket, trials per bucket]
+        self._stats = OrderedDict()
+        # key -> (cumulative proposal, proposal, q_min, observations at build)
+        self._proposals = {}
+        self._observed = {}
+        self.load()
+
+    def load(self):
+        if not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, "r") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return
+        if data.get("bucket_size") != self.bucket_size or data.get("max_id") != self.max_id:
+            return
+        with self._lock:
+            self._stats = OrderedDict((k, v) for k, v in data.get("stats", [])
+                                      if len(v[0]) == self.buckets)
+
+    def save(self):
+        with self._lock:
+            data = {"max_id": self.max_id, "bucket_size": self.bucket_size,
+                    "stats": list(self._stats.items())}
+        tmp = self.path + ".tmp"
+        try:
+            with open(tmp, "w") as f:
+                json.dump(data, f, separators=(",", ":"))
+            os.replace(tmp, self.path)
+        except OSError:
+            pass
+
+    def _counts(self, key):
+        counts = self._stats.get(key)
+        if counts is None:
+            counts = self._stats[key] = [[0] * self.buckets, [0] * self.buckets]
+            while len(self._stats) > MAX_FILTERS + 1:
+                oldest = next(k for k in self._stats if k != ELIGIBLE_KEY)
+                del self._stats[oldest]
+                self._proposals.pop(oldest, None)
+        self._stats.move_to_end(key)
+        return counts
+
+    # === LEARNING ===
+    def observe(self, key, set_id, hit, eligible):
+        # hit: the ID produced a result for the filter `key`;
+        # eligible: it is a ranked/loved/qualified set at all (any filter)
+        b = min(max(set_id - 1, 0) // self.bucket_size, self.buckets - 1)
+        with self._lock:
+            for k, h in ((key, hit), (ELIGIBLE_KEY, eligible)):
+                hits, trials = self._counts(k)
+                hits[b] += bool(h)
+                trials[b] += 1
+                self._observed[k] = self._observed.get(k, 0) + 1
+
+    def _density(self, key):
+        g_hits, g_trials = self._counts(ELIGIBLE_KEY)
+        prior = (sum(g_hits) + 1) / (sum(g_trials) + PRIOR_TRIALS)
+        # all-filter eligibility per bucket, shrunk towards the overall rate
+        g = [(h + PRIOR_TRIALS * prior) / (t + PRIOR_TRIALS) for h, t in zip(g_hits, g_trials)]
+        if key == ELIGIBLE_KEY:
+            return g
+        hits, trials = self._counts(key)
+        scale = (sum(hits) + 1) / (sum(g_hits) + 1)
+        return [(h + PRIOR_TRIALS * gb * scale) / (t + PRIOR_TRIALS)
+                for h, t, gb in zip(hits, trials, g)]
+
+    def _proposal(self, key):
+        observed = self._observed.get(key, 0)
+        cached = self._proposals.get(key)
+        if cached and observed - cached[3] < REBUILD_EVERY:
+            return cached
+        weights = [d ** TEMPER for d in self._density(key)]
+        total = sum(weights)
+        q = [UNIFORM_SHARE / self.buckets + (1 - UNIFORM_SHARE) * w / total for w in weights]
+        cumulative = []
+        running = 0.0
+        for p in q:
+            running += p
+            cumulative.append(running)
+        cached = self._proposals[key] = (cumulative, q, min(q), observed)
+        return cached
+
+    # === DRAWING ===
+    def draw(self, key):
+        # (set_id, acceptance probability for a hit on it); O(log buckets)
+        with self._lock:
+            cumulative, q, q_min, _ = self._proposal(key)
+        b = min(bisect.bisect_right(cumulative, random.random() * cumulative[-1]), self.buckets - 1)
+        # the last bucket may be short; its IDs are proposed more often, so
+        # they are accepted less often
+        size = min(self.bucket_size, self.max_id - b * self.bucket_size)
+        return b * self.bucket_size + 1 + random.randrange(size), q_min / q[b] * size / self.bucket_size
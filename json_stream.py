@@ -0,0 +1,134 @@
+import codecs
+import json
+import re
+from json.decoder import scanstring
+
+import requests
+from urllib3.exceptions import DecodeError, ProtocolError, ReadTimeoutError, SSLError
+
+# === CONFIG ===
+CHUNK_SIZE = 16 * 1024
+# unread bodies up to this size are drained so the connection goes back to the
+# pool; longer ones (and chunked ones that don't end within it) are cut off by
+# closing the connection
+DRAIN_LIMIT = 64 * 1024
+
+_WS = re.compile(r"[ \t\n\r]*")
+_decoder = json.JSONDecoder()
+
+
+# === MEMBERS ===
+def iter_members(chunks):
+    # (key, value) for each member of the top-level JSON object spread over
+    # `chunks` (an iterable of str), yielded as soon as the member is complete.
+    # Values are decoded by the json module's C scanner, so stopping after the
+    # first few members skips decoding everything after them.
+    buf = ""
+    pos = None
+    chunks = iter(chunks)
+    while True:
+        try:
+            if pos is None:
+                start = _WS.match(buf).end()
+                if buf[start] != "{":
+                    raise ValueError("not a JSON object")
+                pos = start + 1
+            i = _WS.match(buf, pos).end()
+            if buf[i] == "}":
+                return
+            if buf[i] == ",":
+                i = _WS.match(buf, i + 1).end()
+            if buf[i] != '"':
+                raise ValueError("expected a key")
+            key, i = scanstring(buf, i + 1)
+            i = _WS.match(buf, i).end()
+            if buf[i] != ":":
+                raise ValueError("expected ':'")
+            value, i = _decoder.raw_decode(buf, _WS.match(buf, i + 1).end())
+            # a number cut by a chunk boundary decodes as its prefix ("1." as 1),
+            # so a value only counts once the ',' or '}' after it has arrived
+            i = _WS.match(buf, i).end()
+            if buf[i] not in ",}":
+                raise ValueError("expected ',' or '}'")
+        except (IndexError, ValueError):
+            # member not complete yet (or malformed, which fails at the end)
+            chunk = next(chunks, None)
+            if chunk is None:
+                raise ValueError("truncated JSON object")
+            buf += chunk
+            continue
+        yield key, value
+        buf, pos = buf[i:], 0
+
+
+# === RESPONSES ===
+def _chunks(res):
+    # the body of a streamed response (requests, stream=True) as it arrives,
+    # raising the same exceptions as iter_content. Unlike iter_content, closing
+    # it early leaves a chunked response's connection usable: urllib3's chunked
+    # reader would close it on the way out.
+    read = getattr(res.raw, "read1", None) or res.raw.read
+    while True:
+        try:
+            chunk = read(CHUNK_SIZE, decode_content=True)
+        except ProtocolError as e:
+            raise requests.exceptions.ChunkedEncodingError(e)
+        except DecodeError as e:
+            raise requests.exceptions.ContentDecodingError(e)
+        except ReadTimeoutError as e:
+            raise requests.exceptions.ConnectionError(e)
+        except SSLError as e:
+            raise requests.exceptions.SSLError(e)
+        if not chunk:
+            return
+        yield chunk
+
+
+def read_head(res, key):
+    # Streams a JSON object response (requests, stream=True) only until its
+    # top-level member `key` has been decoded. Returns (head, body): head holds
+    # the members up to and including `key` (all of them if it is missing),
+    # body() reads the rest and returns the complete raw bytes.
+    raw = []
+
+    def text():
+        utf8 = codecs.getincrementaldecoder("utf-8")()
+        for chunk in _chunks(res):
+            raw.append(chunk)
+            yield utf8.decode(chunk)
+
+    head = {}
+    members = iter_members(text())
+    try:
+        for k, v in members:
+            head[k] = v
+            if k == key:
+                break
+    finally:
+        members.close()
+
+    def body():
+        raw.extend(_chunks(res))
+        return b"".join(raw)
+
+    return head, body
+
+
+def release(res):
+    # hands the connection of a partly read streamed response back to the pool,
+    # or drops it when too much of the body is left to be worth draining
+    remaining = getattr(res.raw, "length_remaining", None)
+    if remaining is None:
+        # chunked: the size is unknown until the last chunk, so read at most
+        # DRAIN_LIMIT; reaching the end puts the connection back in the pool
+        drained = 0
+        try:
+            for chunk in _chunks(res):
+                drained += len(chunk)
+                if drained >= DRAIN_LIMIT:
+                    break
+        except (requests.RequestException, OSError):
+            pass
+    elif remaining <= DRAIN_LIMIT:
+        res.raw.drain_conn()
+    res.close()
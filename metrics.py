@@ -0,0 +1,188 @@
+import json
+import threading
+import time
+from contextlib import contextmanager
+
+# === CONFIG ===
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, float('inf'))
+
+
+def _key(name, labels):
+    return (name, tuple(sorted(labels.items())))
+
+
+class Histogram:
+    def __init__(self, buckets=BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        self.count += 1
+        self.sum += value
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+                break
+
+    def quantile(self, q):
+        # linear interpolation inside the bucket holding the q-th observation
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        lower = 0.0
+        for bound, n in zip(self.buckets, self.counts):
+            if n and seen + n >= rank:
+                if bound == float('inf'):
+                    return lower
+                return lower + (bound - lower) * (rank - seen) / n
+            seen += n
+            lower = bound if bound != float('inf') else lower
+        return lower
+
+
+class Span:
+    def __init__(self, labels):
+        self.labels = labels
+        self.outcome = "ok"
+
+
+# === REGISTRY ===
+# Counters and latency histograms for the search pipeline, exported as JSON or
+# Prometheus text. span() times a block; set span.outcome to label the result.
+class Metrics:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.counters = {}
+        self.histograms = {}
+        self.started = time.time()
+
+    def inc(self, name, value=1, **labels):
+        key = _key(name, labels)
+        with self._lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def observe(self, name, value, **labels):
+        key = _key(name, labels)
+        with self._lock:
+            h = self.histograms.get(key)
+            if h is None:
+                h = self.histograms[key] = Histogram()
+            h.observe(value)
+
+    @contextmanager
+    def span(self, name, **labels):
+        span = Span(labels)
+        start = time.perf_counter()
+        try:
+            yield span
+        except BaseException:
+            span.outcome = "error"
+            raise
+        finally:
+            labels = dict(span.labels, outcome=span.outcome)
+            self.observe(f"{name}_seconds", time.perf_counter() - start, **labels)
+            self.inc(f"{name}_total", **labels)
+
+    # === QUERIES ===
+    def total(self, name, **labels):
+        # sum of a counter over every label set containing `labels`
+        want = set(labels.items())
+        with self._lock:
+            return sum(v for (n, ls), v in self.counters.items() if n == name and want <= set(ls))
+
+    def merged(self, name, **labels):
+        want = set(labels.items())
+        out = Histogram()
+        with self._lock:
+            for (n, ls), h in self.histograms.items():
+                if n == name and want <= set(ls):
+                    out.count += h.count
+                    out.sum += h.sum
+                    out.counts = [a + b for a, b in zip(out.counts, h.counts)]
+        return out
+
+    def summary(self):
+        # short human-readable digest for the GUI stats panel
+        ms = lambda h, q: h.quantile(q) * 1000
+        searches = self.merged("search_seconds")
+        # lookups aborted because another one already hit don't count against the hit rate
+        fetches = self.total("fetch_map_total") - self.total("fetch_map_total", outcome="cancelled")
+        hits = self.total("fetch_map_total", outcome="hit")
+        fetch = self.merged("fetch_map_seconds")
+        thumbs = self.total("thumbnail_fetch_total")
+        cached = (self.total("thumbnail_fetch_total", outcome="fresh") +
+                  self.total("thumbnail_fetch_total", outcome="revalidated"))
+        thumb = self.merged("thumbnail_fetch_seconds")
+        decode = self.merged("thumbnail_decode_seconds")
+        return "\n".join((
+            f"Searches: {searches.count} (index {self.total('search_total', outcome='index')}, "
+            f"random {self.total('search_total', outcome='random')})  "
+            f"p50 {ms(searches, 0.5):.0f} ms  p95 {ms(searches, 0.95):.0f} ms",
+            f"Lookups: {fetches}  hit rate {hits / fetches if fetches else 0:.1%}  "
+            f"cached {self.total('response_cache_total', outcome='hit')}  "
+            f"404 {self.total('fetch_map_total', outcome='404')}  "
+            f"status {self.total('fetch_map_total', outcome='wrong_status')}  "
+            f"filtered {self.total('fetch_map_total', outcome='filtered')}  "
+            f"errors {self.total('fetch_map_total', outcome='error')}",
+            f"Lookup latency: p50 {ms(fetch, 0.5):.0f} ms  p95 {ms(fetch, 0.95):.0f} ms  "
+            f"429s {self.total('api_requests_total', status='429')}  "
+            f"tokens {self.total('token_request_total')}  "
+            f"crawled {self.total('crawl_pages_total', outcome='ok')} pages",
+            f"Thumbnails: {thumbs}  cached {cached / thumbs if thumbs else 0:.0%}  "
+            f"fetch p50 {ms(thumb, 0.5):.0f} ms  decode p50 {ms(decode, 0.5):.0f} ms",
+            "Startup: " + "  ".join(
+                f"{stage} {self.merged('startup_seconds', stage=stage).sum * 1000:.0f} ms"
+                for stage in ("paint", "ready", "connected", "token")
+                if self.merged("startup_seconds", stage=stage).count),
+        ))
+
+    def reset(self):
+        with self._lock:
+            self.counters.clear()
+            self.histograms.clear()
+            self.started = time.time()
+
+    # === EXPORT ===
+    def to_json(self):
+        with self._lock:
+            return json.dumps({
+                "started": self.started,
+                "counters": [{"name": n, "labels": dict(ls), "value": v}
+                             for (n, ls), v in self.counters.items()],
+                "histograms": [{"name": n, "labels": dict(ls), "count": h.count, "sum": h.sum,
+                                "buckets": [[b if b != float('inf') else "+Inf", c]
+                                            for b, c in zip(h.buckets, h.counts)]}
+                               for (n, ls), h in self.histograms.items()],
+            })
+
+    def to_prometheus(self, prefix="orb_"):
+        def fmt(labels):
+            if not labels:
+                return ""
+            return "{" + ",".join(f'{k}="{v}"' for k, v in labels) + "}"
+
+        lines = []
+        with self._lock:
+            for (n, ls), v in sorted(self.counters.items()):
+                lines.append(f"{prefix}{n}{fmt(ls)} {v}")
+            for (n, ls), h in sorted(self.histograms.items()):
+                cumulative = 0
+                for bound, c in zip(h.buckets, h.counts):
+                    cumulative += c
+                    le = "+Inf" if bound == float('inf') else repr(bound)
+                    lines.append(f"{prefix}{n}_bucket{fmt(ls + (('le', le),))} {cumulative}")
+                lines.append(f"{prefix}{n}_sum{fmt(ls)} {h.sum}")
+                lines.append(f"{prefix}{n}_count{fmt(ls)} {h.count}")
+        return "\n".join(lines) + "\n"
+
+    def write(self, path):
+        # .prom / .txt -> Prometheus text format, anything else -> JSON
+        text = self.to_prometheus() if path.endswith((".prom", ".txt")) else self.to_json()
+        with open(path, "w") as f:
+            f.write(text)
+
+
+metrics = Metrics()
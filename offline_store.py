@@ -0,0 +1,287 @@
+import argparse
+import json
+import os
+import re
+import sqlite3
+import sys
+import tarfile
+import threading
+import time
+
+from sampler import CandidatePool
+
+# === CONFIG ===
+OFFLINE_DB = "beatmaps.sqlite"
+# osu! "approved" codes as used by the data dumps and the API's "ranked" field
+STATUS_NAMES = {-2: "graveyard", -1: "wip", 0: "pending", 1: "ranked",
+                2: "approved", 3: "qualified", 4: "loved"}
+STATUS_CODES = {v: k for k, v in STATUS_NAMES.items()}
+ELIGIBLE_CODES = (1, 2, 3, 4)
+COVER_URL = "https://assets.ppy.sh/beatmaps/{}/covers/cover@2x.jpg"
+BATCH_SIZE = 5000
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS beatmapsets (
+    set_id INTEGER PRIMARY KEY, status INTEGER, title TEXT, artist TEXT, cover TEXT);
+CREATE TABLE IF NOT EXISTS beatmaps (
+    beatmap_id INTEGER PRIMARY KEY, set_id INTEGER NOT NULL, status INTEGER,
+    mode_int INTEGER, difficulty_rating REAL, total_length INTEGER, bpm REAL, version TEXT);
+CREATE INDEX IF NOT EXISTS beatmaps_filter ON beatmaps (status, mode_int, difficulty_rating, set_id);
+CREATE INDEX IF NOT EXISTS beatmaps_set ON beatmaps (set_id);
+"""
+
+
+# === SQL DUMP PARSING ===
+# data.ppy.sh dumps are mysqldump output: a CREATE TABLE per table followed by
+# long "INSERT INTO `t` VALUES (...),(...);" lines. Column order is taken from
+# the CREATE TABLE so schema changes between dumps don't matter.
+_VALUE = re.compile(r"'((?:[^'\\]|\\.)*)'|(NULL)|([-+0-9.eE]+)|(\()|(\))")
+_ESCAPE = re.compile(r"\\(.)")
+_UNESCAPE = {"0": "\0", "n": "\n", "r": "\r", "t": "\t", "Z": "\x1a"}
+
+
+def _unescape(s):
+    if "\\" not in s:
+        return s
+    return _ESCAPE.sub(lambda m: _UNESCAPE.get(m.group(1), m.group(1)), s)
+
+
+def _number(s):
+    try:
+        return int(s)
+    except ValueError:
+        return float(s)
+
+
+def parse_values(line):
+    # yields one list per "(...)" tuple of an INSERT ... VALUES line
+    row = None
+    for m in _VALUE.finditer(line, line.index("VALUES") + 6):
+        string, null, number, opening, closing = m.groups()
+        if opening:
+            row = []
+        elif closing:
+            yield row
+            row = None
+        elif row is None:
+            continue
+        elif string is not None:
+            row.append(_unescape(string))
+        elif null:
+            row.append(None)
+        else:
+            row.append(_number(number))
+
+
+def parse_dump(lines):
+    # yields (table, {column: value}) for every row of every table in the dump
+    table = None
+    columns = {}
+    for line in lines:
+        if line.startswith("CREATE TABLE"):
+            table = line.split("`")[1]
+            columns[table] = []
+        elif table and line.startswith("  `"):
+            columns[table].append(line.split("`")[1])
+        elif line.startswith("INSERT INTO"):
+            name = line.split("`")[1]
+            cols = columns.get(name)
+            if not cols:
+                continue
+            for row in parse_values(line):
+                yield name, dict(zip(cols, row))
+
+
+# === STORE ===
+# Offline beatmap store: every set and difficulty from a dump (or our own
+# index / recorded API responses) in SQLite, so random picks with the usual
+# mode / star filters need no API request at all.
+class OfflineStore:
+    def __init__(self, path=OFFLINE_DB):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.executescript(SCHEMA)
+        self._candidates = {}
+
+    def __len__(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM beatmapsets").fetchone()[0]
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    # === IMPORT ===
+    def _write(self, sets, maps):
+        with self._lock:
+            with self._conn:
+                self._conn.executemany(
+                    "INSERT OR REPLACE INTO beatmapsets VALUES (?, ?, ?, ?, ?)", sets)
+                self._conn.executemany(
+                    "INSERT OR REPLACE INTO beatmaps VALUES (?, ?, ?, ?, ?, ?, ?, ?)", maps)
+            self._candidates.clear()
+        sets.clear()
+        maps.clear()
+
+    def import_rows(self, rows):
+        # rows: (kind, tuple) with kind "set" -> (set_id, status, title, artist, cover)
+        # and "map" -> (beatmap_id, set_id, status, mode_int, rating, length, bpm, version)
+        sets, maps = [], []
+        count = 0
+        for kind, row in rows:
+            (sets if kind == "set" else maps).append(row)
+            count += 1
+            if len(sets) + len(maps) >= BATCH_SIZE:
+                self._write(sets, maps)
+        self._write(sets, maps)
+        return count
+
+    def import_dump(self, path):
+        # a data.ppy.sh archive (.tar.bz2), an extracted dump directory or a single .sql file
+        return self.import_rows(_dump_rows(path))
+
+    def import_index(self, path):
+        # our own beatmap_index.json: difficulties only, so titles already
+        # imported from a dump are kept
+        with open(path, "r") as f:
+            sets = json.load(f).get("sets", {})
+
+        def rows():
+            for set_id, entry in sets.items():
+                set_id = int(set_id)
+                code = STATUS_CODES.get(entry["status"], 0)
+                for d in entry["diffs"]:
+                    mode_int, rating, beatmap_id, length, bpm = (list(d) + [0, 0, 0])[:5]
+                    if beatmap_id:
+                        yield "map", (beatmap_id, set_id, code, mode_int, rating, length, bpm, None)
+        return self.import_rows(rows())
+
+    def import_api_json(self, path):
+        # JSON lines of /beatmapsets/{id} objects, bare or as recorded by
+        # bench/record_responses.py ({"path", "status", "body"})
+        def rows():
+            with open(path, "r", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        data = json.loads(line)
+                    except ValueError:
+                        continue
+                    data = data.get("body", data) if isinstance(data, dict) else None
+                    if isinstance(data, dict) and data.get("id") and "beatmaps" in data:
+                        yield from _api_rows(data)
+        return self.import_rows(rows())
+
+    def import_path(self, path):
+        if path.endswith(".jsonl"):
+            return self.import_api_json(path)
+        if path.endswith(".json"):
+            return self.import_index(path)
+        return self.import_dump(path)
+
+    # === QUERIES ===
+    def pool(self, modes, min_rating, max_rating, by="set"):
+        # CandidatePool over the eligible difficulties passing the filter,
+        # cached per filter so each pick is a couple of randranges
+        key = (frozenset(modes), min_rating, max_rating, by)
+        with self._lock:
+            pool = self._candidates.get(key)
+            if pool is None:
+                modes = sorted(modes) or [-1]
+                sql = (f"SELECT set_id, beatmap_id, difficulty_rating FROM beatmaps WHERE status IN "
+                       f"({','.join('?' * len(ELIGIBLE_CODES))}) AND mode_int IN "
+                       f"({','.join('?' * len(modes))}) AND difficulty_rating BETWEEN ? AND ? "
+                       f"ORDER BY set_id")
+                args = (*ELIGIBLE_CODES, *modes, min_rating, min(max_rating, 1e9))
+                rows = self._conn.execute(sql, args).fetchall()
+                pool = CandidatePool(*(tuple(zip(*rows)) or ((), (), ())), by=by)
+                if len(self._candidates) > 16:
+                    self._candidates.clear()
+                self._candidates[key] = pool
+            return pool
+
+    def sample(self, modes, min_rating, max_rating, by="set", history=None, cycle=True):
+        return self.pool(modes, min_rating, max_rating, by).draw(history, cycle)
+
+    def beatmapset(self, set_id):
+        # the subset of the API's beatmapset JSON the searcher reads, or None
+        # one indexed query per pick; sets imported without a beatmapsets row
+        # (e.g. from beatmap_index.json) take the status of their difficulties
+        with self._lock:
+            maps = self._conn.execute(
+                "SELECT b.beatmap_id, b.mode_int, b.difficulty_rating, b.total_length, b.bpm, "
+                "b.version, COALESCE(s.status, b.status), s.title, s.artist, s.cover "
+                "FROM beatmaps b LEFT JOIN beatmapsets s ON s.set_id = b.set_id "
+                "WHERE b.set_id = ?", (set_id,)).fetchall()
+        if not maps:
+            return None
+        status, title, artist, cover = maps[0][6:]
+        return {"id": set_id, "status": STATUS_NAMES.get(status, "unknown"),
+                "title": title or "N/A", "artist": artist or "N/A",
+                "covers": {"cover@2x": cover or COVER_URL.format(set_id)},
+                "beatmaps": [{"id": b[0], "mode_int": b[1], "difficulty_rating": b[2] or 0,
+                              "total_length": b[3], "bpm": b[4], "version": b[5]}
+                             for b in maps]}
+
+
+def _api_rows(data):
+    set_id = data["id"]
+    code = data.get("ranked", STATUS_CODES.get(data.get("status"), 0))
+    covers = data.get("covers") or {}
+    yield "set", (set_id, code, data.get("title"), data.get("artist"),
+                  covers.get("cover@2x") or covers.get("cover"))
+    for b in data.get("beatmaps", []):
+        yield "map", (b.get("id"), set_id, code, b.get("mode_int"), b.get("difficulty_rating"),
+                      b.get("total_length"), b.get("bpm"), b.get("version"))
+
+
+def _dump_rows(path):
+    for table, row in parse_dump(_dump_lines(path)):
+        if table == "osu_beatmapsets":
+            yield "set", (row["beatmapset_id"], row.get("approved"), row.get("title"),
+                          row.get("artist"), None)
+        elif table == "osu_beatmaps":
+            yield "map", (row["beatmap_id"], row["beatmapset_id"], row.get("approved"),
+                          row.get("playmode"), row.get("difficultyrating"),
+                          row.get("total_length"), row.get("bpm"), row.get("version"))
+
+
+def _dump_lines(path):
+    # only the two tables we need are read; the dumps carry many more
+    wanted = ("osu_beatmapsets.sql", "osu_beatmaps.sql")
+    if os.path.isdir(path):
+        for name in wanted:
+            if os.path.exists(os.path.join(path, name)):
+                with open(os.path.join(path, name), "r", encoding="utf-8", errors="replace") as f:
+                    yield from f
+    elif tarfile.is_tarfile(path):
+        with tarfile.open(path, "r:*") as tar:
+            for member in tar:
+                if os.path.basename(member.name) in wanted:
+                    for raw in tar.extractfile(member):
+                        yield raw.decode("utf-8", errors="replace")
+    else:
+        with open(path, "r", encoding="utf-8", errors="replace") as f:
+            yield from f
+
+
+# === CLI ===
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Import osu! beatmap data into an offline store.")
+    parser.add_argument("sources", nargs="+",
+                        help="data.ppy.sh dump (.tar.bz2, directory or .sql), "
+                             "beatmap_index.json or .jsonl of API beatmapsets")
+    parser.add_argument("--db", default=OFFLINE_DB)
+    args = parser.parse_args(argv)
+    store = OfflineStore(args.db)
+    for source in args.sources:
+        start = time.perf_counter()
+        count = store.import_path(source)
+        print(f"{source}: {count} rows in {time.perf_counter() - start:.1f}s", file=sys.stderr)
+    print(f"{args.db}: {len(store)} beatmapsets", file=sys.stderr)
+    store.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,430 @@
+import argparse
+import json
+import os
+import random
+import sys
+import time
+from collections import namedtuple
+
+import requests
+
+try:
+    import orjson  # optional, several times faster on large beatmapset payloads
+    loads = orjson.loads
+except ImportError:
+    loads = json.loads
+
+from beatmap_index import BeatmapIndex, ELIGIBLE_STATUSES, INDEX_FILE
+from cancel import CancelToken, current
+from crawler import Crawler
+from id_cache import InvalidIdCache, CACHE_FILE, DRAW_TRIES
+from id_sampler import AdaptiveIdSampler, DENSITY_FILE, filter_key
+from json_stream import read_head, release
+from fetch_engine import FetchEngine, OSU_URL
+from metrics import metrics
+from offline_store import OfflineStore
+from response_cache import ResponseCache, RESPONSE_FILE, compact, expand
+from sampler import SeenHistory, HISTORY_FILE, SAMPLE_MODES
+from session import SessionStore, SESSION_FILE
+from osu_token import TokenManager
+from thumbnail_cache import ThumbnailCache, CACHE_DIR
+
+# === CONFIG ===
+API_URL = f"{OSU_URL}/api/v2"
+CONFIG_FILE = "osu_credentials.json"
+INDEX_TRIES = 3
+MODES = ("osu", "taiko", "fruits", "mania")
+mode_map = dict(enumerate(MODES))
+
+
+# === FILTER / RESULT ===
+class SearchFilter(namedtuple("SearchFilter", "modes min_rating max_rating")):
+    # immutable so it can be handed to worker threads as-is
+    def __new__(cls, modes=MODES, min_rating=0.0, max_rating=float('inf')):
+        return super().__new__(cls, frozenset(modes), float(min_rating), float(max_rating))
+
+    @property
+    def mode_ints(self):
+        return {i for i, m in mode_map.items() if m in self.modes}
+
+    def accepts(self, mode_int, rating):
+        return (mode_map.get(mode_int) in self.modes and
+                self.min_rating <= rating <= self.max_rating)
+
+    def matches(self, result):
+        return result.mode in self.modes and self.min_rating <= result.rating <= self.max_rating
+
+
+class MapResult(namedtuple("MapResult", "set_id beatmap_id title artist status mode rating url thumb")):
+    @property
+    def display_title(self):
+        return (f"{self.title} [{self.artist}] ({self.status.capitalize()}, "
+                f"{self.mode.capitalize()}) - {self.rating}★")
+
+
+# === SEARCHER ===
+class Searcher:
+    def __init__(self, client_id, client_secret, token_file=None, data_dir=".", offline_db=None,
+                 sample_mode="set", shard=None):
+        # data_dir holds the index, response cache, invalid-ID bitmap, ID density
+        # estimates, seen history, session store and thumbnail cache;
+        # offline_db: an OfflineStore database to pick from instead of the API;
+        # sample_mode: one of SAMPLE_MODES, how known candidates are weighted;
+        # shard: (k, n) to only probe random IDs with id % n == k; a sharded
+        # searcher (a worker process) never repeats a set, so once its index has
+        # nothing new for the filter it probes random IDs instead
+        self.data_dir = data_dir
+        self.shard = shard
+        self.tokens = TokenManager(client_id, client_secret, token_file)
+        self.responses = ResponseCache(os.path.join(data_dir, RESPONSE_FILE))
+        self.index = BeatmapIndex(os.path.join(data_dir, INDEX_FILE), self.responses)
+        self.invalid_ids = InvalidIdCache(os.path.join(data_dir, CACHE_FILE))
+        self.id_sampler = AdaptiveIdSampler(os.path.join(data_dir, DENSITY_FILE),
+                                            self.invalid_ids.max_id)
+        self.engine = FetchEngine()
+        self.thumbs = ThumbnailCache(os.path.join(data_dir, CACHE_DIR))
+        self.offline = OfflineStore(offline_db) if offline_db else None
+        self.history = SeenHistory(os.path.join(data_dir, HISTORY_FILE))
+        self.sample_mode = sample_mode
+        self.session = SessionStore(os.path.join(data_dir, SESSION_FILE))
+        # budgeted background crawl for interactive use; bulk runs use index.start_refresher
+        self.crawler = Crawler(self)
+
+    def save(self):
+        self.index.save()
+        self.responses.save()
+        self.invalid_ids.save()
+        self.id_sampler.save()
+        self.history.save()
+
+    def get_osu_token(self):
+        return self.tokens.get()
+
+    def fetch_map_by_id(self, set_id, flt, cancel=None, beatmap_id=None):
+        # beatmap_id: the difficulty the sampler drew, used if it still passes the filter
+        results = self.fetch_maps_by_id(set_id, flt, cancel)
+        if not results:
+            return None
+        # a uniformly chosen matching difficulty, not whichever the API lists first
+        return next((r for r in results if r.beatmap_id == beatmap_id), None) or random.choice(results)
+
+    def fetch_maps_by_id(self, set_id, flt, cancel=None):
+        # every difficulty of the set passing the filter, [] if none
+        if cancel is not None and cancel.cancelled:
+            return []
+        if self.offline is not None:
+            data = self.offline.beatmapset(set_id)
+            if data is None or data.get('status') not in ELIGIBLE_STATUSES:
+                return []
+            return self._to_results(data, flt)
+        with metrics.span("fetch_map") as span:
+            data = self.responses.get(set_id)
+            fetched = data is None
+            metrics.inc("response_cache_total", outcome="miss" if fetched else "hit")
+            if fetched:
+                data = self._fetch_set(set_id, cancel, span)
+                if data is None:
+                    return []
+            self.index.add_set(data)
+            self.invalid_ids.observe(data.get('id'))
+            if data.get('status') not in ELIGIBLE_STATUSES:
+                # the invalid-ID bitmaps remember it; the response cache is kept
+                # for sets worth returning
+                self.invalid_ids.mark_status(set_id, data.get('status'))
+                span.outcome = "wrong_status"
+                return []
+            if fetched:
+                self.responses.put(data)
+            results = self._to_results(data, flt)
+            span.outcome = "hit" if results else "filtered"
+            return results
+
+    def _to_results(self, data, flt):
+        map_id = data.get('id')
+        covers = data.get('covers', {})
+        return [MapResult(
+                    set_id=map_id, beatmap_id=bm.get('id'),
+                    title=data.get('title', 'N/A'), artist=data.get('artist', 'N/A'),
+                    status=data.get('status', 'N/A'), mode=mode_map[bm.get('mode_int')],
+                    rating=round(bm.get('difficulty_rating', 0), 2),
+                    url=f"https://osu.ppy.sh/beatmapsets/{map_id}",
+                    thumb=covers.get('cover@2x') or covers.get('cover'))
+                for bm in data.get('beatmaps', [])
+                if flt.accepts(bm.get('mode_int'), bm.get('difficulty_rating', 0))]
+
+    def _fetch_set(self, set_id, cancel, span):
+        # the /beatmapsets/{id} fields the searcher reads (see response_cache.expand),
+        # or None with span.outcome saying why. The body is streamed and decoded
+        # only up to "status"; an ineligible set (most random IDs) comes back
+        # with no difficulties and the rest of its payload is never parsed.
+        res = None
+        try:
+            res = self.tokens.authorized_get(f"{API_URL}/beatmapsets/{set_id}", timeout=10,
+                                             stream=True)
+            if res is None:
+                span.outcome = "no_token"
+                return None
+            if res.status_code == 404:
+                self.index.discard(set_id)
+                self.invalid_ids.mark_missing(set_id)
+                span.outcome = "404"
+                return None
+            res.raise_for_status()
+            head, body = read_head(res, "status")
+            if "status" in head and head["status"] not in ELIGIBLE_STATUSES:
+                metrics.inc("beatmapset_parse_total", outcome="status_only")
+                return {"id": head.get("id", set_id), "status": head["status"], "beatmaps": []}
+            metrics.inc("beatmapset_parse_total", outcome="full")
+            return expand(set_id, compact(loads(body())))
+        except (requests.RequestException, ValueError):
+            # first_hit binds each worker to a round token that is cancelled on a hit
+            token = current() or cancel
+            span.outcome = "cancelled" if token is not None and token.cancelled else "error"
+            return None
+        finally:
+            if res is not None:
+                release(res)
+
+    def get_random_map(self, flt, cancel=None):
+        # cancel: CancelToken for this search; cancelling it aborts the requests
+        # still in flight and makes this return None
+        cancel = cancel or CancelToken()
+        with metrics.span("search") as span:
+            r = self._search(flt, cancel, span)
+            if r is None:
+                span.outcome = "cancelled" if cancel.cancelled else "miss"
+            else:
+                self.history.add(r.set_id)
+            return r
+
+    def _search(self, flt, cancel, span):
+        modes = flt.mode_ints
+        if self.offline is not None:
+            # every pick is local; nothing to confirm against the API
+            pick = self.offline.sample(modes, flt.min_rating, flt.max_rating,
+                                       self.sample_mode, self.history)
+            span.outcome = "offline"
+            return self.fetch_map_by_id(pick[0], flt, cancel, pick[1]) if pick else None
+        # Known sets from the local index first: one confirming request per pick
+        with cancel.bound():
+            for _ in range(INDEX_TRIES):
+                pick = self.index.sample(modes, flt.min_rating, flt.max_rating,
+                                         self.sample_mode, self.history, cycle=not self.shard)
+                if pick is None or cancel.cancelled:
+                    break
+                r = self.fetch_map_by_id(pick[0], flt, cancel, pick[1])
+                if r:
+                    span.outcome = "index"
+                    return r
+        # Fall back to random IDs not yet known to be bad while the index is still empty
+        next_id, probe = self._prober(flt, cancel, self.fetch_map_by_id)
+        r = self.engine.first_hit(probe, next_id, cancel)
+        span.outcome = "random"
+        return r
+
+    def search_batch(self, flt, count, cancel=None, distinct="difficulty"):
+        # generator over up to `count` distinct MapResults, yielded as they arrive.
+        # Every matching difficulty of every set found is kept, deduplicated by
+        # (set, difficulty), or by set with distinct="set". Closing the generator
+        # or cancelling `cancel` stops the search and aborts its requests.
+        cancel = cancel or CancelToken()
+        seen = set()
+        produced = 0
+
+        def fresh(results, source):
+            nonlocal produced
+            if distinct == "set":
+                random.shuffle(results)
+            out = []
+            for r in results:
+                key = r.set_id if distinct == "set" else (r.set_id, r.beatmap_id)
+                if produced < count and key not in seen:
+                    seen.add(key)
+                    self.history.add(r.set_id)
+                    out.append(r)
+                    produced += 1
+            metrics.inc("batch_results_total", len(out), source=source)
+            return out
+
+        # Known sets first (every pick is local offline), until they stop turning up new maps
+        known = self.offline if self.offline is not None else self.index
+        source = "offline" if self.offline is not None else "index"
+        misses = 0
+        with cancel.bound():
+            while produced < count and misses < INDEX_TRIES and not cancel.cancelled:
+                pick = known.sample(flt.mode_ints, flt.min_rating, flt.max_rating,
+                                    self.sample_mode, self.history, cycle=not self.shard)
+                if pick is None:
+                    break
+                new = fresh(self.fetch_maps_by_id(pick[0], flt, cancel), source)
+                misses = 0 if new else misses + 1
+                yield from new
+        if self.offline is not None or produced >= count or cancel.cancelled:
+            return
+        # then random IDs, keeping every hit of every round instead of only the first
+        next_id, probe = self._prober(flt, cancel, self.fetch_maps_by_id)
+        hits = self.engine.hits(probe, next_id, cancel)
+        try:
+            for results in hits:
+                yield from fresh(results, "random")
+                if produced >= count:
+                    return
+        finally:
+            hits.close()
+
+    def _prober(self, flt, cancel, fetch):
+        # (next_id, probe) for the random-ID fallback, biased towards ID ranges
+        # dense in hits, see AdaptiveIdSampler
+        key = filter_key(flt)
+        accept = {}
+
+        def next_id():
+            set_id, accept[set_id] = self._draw_unseen(key)
+            return set_id
+
+        def probe(set_id):
+            r = fetch(set_id, flt, cancel)
+            token = current()
+            if token is not None and token.cancelled:
+                return None
+            self.id_sampler.observe(key, set_id, bool(r), set_id in self.index.sets)
+            # hits from over-sampled ranges are only returned with probability
+            # q_min / q, keeping the pick uniform; the set stays indexed either way
+            if r and random.random() >= accept.pop(set_id, 1.0):
+                metrics.inc("adaptive_rejected_total")
+                return None
+            return r
+
+        return next_id, probe
+
+    def _draw_unseen(self, key):
+        # (set_id, acceptance) for the random-ID fallback, skipping sets known to
+        # be invalid or already handed out
+        for _ in range(DRAW_TRIES):
+            set_id, a = self.id_sampler.draw(key)
+            if self.shard:
+                k, n = self.shard
+                set_id = set_id - set_id % n + k or n + k
+            if set_id not in self.history and not self.invalid_ids.is_invalid(set_id):
+                break
+        return set_id, a
+
+    def fetch_thumbnail(self, url):
+        with metrics.span("thumbnail_fetch") as span:
+            data, span.outcome = self.thumbs.fetch(url)
+            return data
+
+
+# === CLI ===
+def load_credentials(path=CONFIG_FILE):
+    cid = os.environ.get("OSU_CLIENT_ID")
+    secret = os.environ.get("OSU_CLIENT_SECRET")
+    if (not cid or not secret) and os.path.exists(path):
+        try:
+            with open(path, "r") as f:
+                data = json.load(f)
+            cid, secret = data.get("client_id"), data.get("client_secret")
+        except (OSError, ValueError):
+            pass
+    return cid, secret
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Stream random osu! beatmaps as JSON lines.")
+    parser.add_argument("-n", "--count", type=int, default=1, help="number of maps to generate")
+    parser.add_argument("--modes", default=",".join(MODES), help="comma-separated modes")
+    parser.add_argument("--min-stars", type=float, default=0.0)
+    parser.add_argument("--max-stars", type=float, default=float('inf'))
+    parser.add_argument("--unique", action="store_true", help="never repeat a beatmapset")
+    parser.add_argument("--sample", choices=SAMPLE_MODES, default="set",
+                        help="uniform over sets, over difficulties, or over star buckets")
+    parser.add_argument("--forget-history", action="store_true",
+                        help="clear the persistent no-repeat history first")
+    parser.add_argument("--client-id")
+    parser.add_argument("--client-secret")
+    parser.add_argument("--offline", metavar="DB",
+                        help="pick from an offline_store.py database instead of the API")
+    parser.add_argument("--processes", type=int, default=0, metavar="N",
+                        help="spread the search over N worker processes (bulk generation)")
+    parser.add_argument("--batch", action="store_true",
+                        help="keep every matching difficulty of every set found, not one per search")
+    parser.add_argument("--metrics", metavar="FILE",
+                        help="write search metrics on exit (.prom for Prometheus text, else JSON)")
+    args = parser.parse_args(argv)
+
+    cid, secret = load_credentials()
+    cid, secret = args.client_id or cid, args.client_secret or secret
+    modes = [m.strip() for m in args.modes.split(",") if m.strip()]
+    if (not cid or not secret) and not args.offline:
+        parser.error("missing osu! API credentials (OSU_CLIENT_ID/OSU_CLIENT_SECRET or osu_credentials.json)")
+    if not modes or any(m not in MODES for m in modes):
+        parser.error(f"--modes must be a subset of {','.join(MODES)}")
+    if args.max_stars <= args.min_stars:
+        parser.error("--max-stars must be greater than --min-stars")
+
+    searcher = Searcher(cid, secret, token_file="osu_token.json", offline_db=args.offline,
+                        sample_mode=args.sample)
+    if args.forget_history:
+        searcher.history.clear()
+    flt = SearchFilter(modes, args.min_stars, args.max_stars)
+    if not args.offline:
+        if not searcher.get_osu_token():
+            print("Failed to get API token", file=sys.stderr)
+            return 1
+        searcher.index.start_refresher(searcher.tokens,
+                                       None if flt.modes == set(MODES) else flt.mode_ints)
+    seen = set()
+    start = time.perf_counter()
+    produced = 0
+    workers = None
+    if args.processes and not args.offline:
+        from process_search import ProcessSearcher
+        workers = ProcessSearcher(searcher, args.processes)
+        results = workers.generate(flt, args.count)
+    elif args.batch:
+        results = searcher.search_batch(flt, args.count,
+                                        distinct="set" if args.unique else "difficulty")
+    else:
+        results = iter(lambda: searcher.get_random_map(flt), object())
+    status = 0
+    try:
+        for r in results:
+            if produced >= args.count:
+                break
+            if r is None:
+                if args.offline:
+                    # offline picks are all local: None means nothing matches
+                    break
+                continue
+            if args.unique:
+                if r.set_id in seen:
+                    continue
+                seen.add(r.set_id)
+            print(json.dumps(r._asdict(), ensure_ascii=False), flush=True)
+            produced += 1
+    except KeyboardInterrupt:
+        pass
+    except RuntimeError as exc:
+        # every worker process died
+        print(exc, file=sys.stderr)
+        status = 1
+    finally:
+        if hasattr(results, "close"):
+            # stops the worker processes and merges what they learned before saving
+            results.close()
+        searcher.save()
+        if args.metrics:
+            metrics.write(args.metrics)
+    if args.offline and args.count and not produced:
+        print("No maps in the offline database match the filter", file=sys.stderr)
+        status = 1
+    elapsed = time.perf_counter() - start
+    print(f"{produced} maps in {elapsed:.2f}s ({produced / elapsed if elapsed else 0:.2f} maps/s)",
+          file=sys.stderr)
+    if workers is not None:
+        print(workers.summary(), file=sys.stderr)
+    return status
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,16 +1,15 @@
+import startup  # first, so startup timing starts here
 import tkinter as tk
-import random
-import requests
 import webbrowser
 import threading
-import io
 import json
 import os
-from PIL import Image, ImageTk
+from metrics import metrics
+from ui_channel import UiChannel
 
 # === CONFIG ===
 CONFIG_FILE = "osu_credentials.json"
-NUM_ATTEMPTS = 15
+TOKEN_FILE = "osu_token.json"
 
 # Globals
 current_url = ""
@@ -20,7 +19,10 @@ mode_vars = {}
 selected_min_rating = 0.0
 selected_max_rating = 10.0
 loading = False
-mode_map = {0: "osu", 1: "taiko", 2: "fruits", 3: "mania"}
+search_cancel = None
+search_gen = 0
+batch_results = []
+batch_shown = None
 
 # === CREDENTIALS ===
 def load_credentials():
@@ -37,74 +39,10 @@ def save_credentials(cid, secret):
     with open(CONFIG_FILE, "w") as f:
         json.dump({"client_id": cid, "client_secret": secret}, f)
 
-OSU_CLIENT_ID, OSU_CLIENT_SECRET = load_credentials()
-
-# === API ===
-def get_osu_token():
-    try:
-        res = requests.post(
-            "https://osu.ppy.sh/oauth/token",
-            json={"client_id": OSU_CLIENT_ID,
-                  "client_secret": OSU_CLIENT_SECRET,
-                  "grant_type": "client_credentials",
-                  "scope": "public"}, timeout=10)
-        res.raise_for_status()
-        return res.json().get('access_token')
-    except:
-        return None
-
-
-def fetch_map_by_id(random_id, token):
-    if not loading:
-        return None
-    try:
-        res = requests.get(f"https://osu.ppy.sh/api/v2/beatmapsets/{random_id}",
-                           headers={"Authorization": f"Bearer {token}"}, timeout=10)
-        res.raise_for_status()
-        data = res.json()
-        if data.get('status') not in ['ranked', 'loved', 'qualified', 'approved']:
-            return None
-        valid = []
-        for b in data.get('beatmaps', []):
-            mode_str = mode_map.get(b.get('mode_int'))
-            rating = b.get('difficulty_rating', 0)
-            if (mode_str in mode_vars and mode_vars[mode_str].get() and
-                    selected_min_rating <= rating <= selected_max_rating):
-                valid.append((b, mode_str))
-        if not valid:
-            return None
-        bm, mode_str = valid[0]
-        title = data.get('title', 'N/A')
-        artist = data.get('artist', 'N/A')
-        status = data.get('status', 'N/A').capitalize()
-        rating = round(bm.get('difficulty_rating', 0), 2)
-        map_id = data.get('id')
-        url = f"https://osu.ppy.sh/beatmapsets/{map_id}"
-        thumb = data.get('covers', {}).get('cover@2x') or data.get('covers', {}).get('cover')
-        display_title = f"{title} [{artist}] ({status}, {mode_str.capitalize()}) - {rating}★"
-        return display_title, url, str(map_id), thumb
-    except:
-        return None
-
-
-def get_random_map(token):
-    while loading:
-        threads = []
-        results = []
-        def attempt():
-            if not loading:
-                return
-            r = fetch_map_by_id(random.randint(1, 3000000), token)
-            if r:
-                results.append(r)
-        for _ in range(NUM_ATTEMPTS):
-            t = threading.Thread(target=attempt, daemon=True)
-            t.start(); threads.append(t)
-        for t in threads:
-            t.join(timeout=5)
-        if results:
-            return results[0]
-    return None
+OSU_CLIENT_ID = OSU_CLIENT_SECRET = None
+# set once the warm-up thread has built them, see on_ready
+searcher = None
+prefetcher = None
 
 # === GUI UPDATE ===
 def show_feedback(msg):
@@ -117,27 +55,19 @@ def open_map(event=None):
         webbrowser.open(current_url)
 
 
-def update_ui(title, url, thumbnail_bytes, map_id_str):
-    global current_url, current_map_id, current_thumbnail_photo, loading
+def show_map(title, url, thumbnail, map_id_str):
+    global current_url, current_map_id, current_thumbnail_photo
     current_url = url
     current_map_id = map_id_str
-    status_label.config(text="")
     info_label.config(text=title)
     copy_link_btn.config(state="normal")
     copy_id_btn.config(state="normal")
-    min_scale.config(state="normal")
-    max_scale.config(state="normal")
-    search_btn.config(text="Search Random Beatmap", state="normal")
-    loading = False
-    if thumbnail_bytes:
-        try:
-            img = Image.open(io.BytesIO(thumbnail_bytes))
-            img.thumbnail((450, 300), Image.Resampling.LANCZOS)
-            current_thumbnail_photo = ImageTk.PhotoImage(img)
-            thumbnail_label.config(image=current_thumbnail_photo, text="")
-            thumbnail_label.image = current_thumbnail_photo
-        except:
-            thumbnail_label.config(text="Thumbnail N/A", image="")
+    # Thumbnail
+    if thumbnail is not None:
+        from PIL import ImageTk
+        current_thumbnail_photo = ImageTk.PhotoImage(thumbnail)
+        thumbnail_label.config(image=current_thumbnail_photo, text="")
+        thumbnail_label.image = current_thumbnail_photo
     else:
         thumbnail_label.config(text="Thumbnail N/A", image="")
     for widget in (result_frame, thumbnail_label, info_label):
@@ -145,26 +75,137 @@ def update_ui(title, url, thumbnail_bytes, map_id_str):
         widget.bind('<Button-1>', open_map)
 
 
-def fetch_and_display():
-    token = get_osu_token()
-    if not token:
-        root.after(0, lambda: status_label.config(text="Failed to get API token"))
-        root.after(0, lambda: update_ui("", "", None, ""))
+def end_search():
+    global loading
+    # restore controls
+    min_scale.config(state="normal")
+    max_scale.config(state="normal")
+    count_spin.config(state="readonly")
+    presets_btn.config(state="normal")
+    search_btn.config(text="Search Random Beatmap", state="normal")
+    loading = False
+
+
+def update_ui(title, url, thumbnail, map_id_str):
+    status_label.config(text="")
+    show_map(title, url, thumbnail, map_id_str)
+    end_search()
+
+
+def show_result(gen, title, url, thumbnail, map_id_str):
+    # first result wins; results of a stopped or superseded search are dropped
+    if gen == search_gen and loading:
+        update_ui(title, url, thumbnail, map_id_str)
+
+
+def show_error(gen, msg):
+    if gen == search_gen:
+        status_label.config(text=msg)
+
+
+def stop_search():
+    global search_gen
+    search_gen += 1
+    if search_cancel is not None:
+        search_cancel.cancel()
+    if batch_results and batch_frame.winfo_manager():
+        # a stopped K-map search keeps the maps it already found
+        finish_batch(search_gen)
+    else:
+        update_ui("", "", None, "")
+
+
+def fetch_and_display(flt, cancel, gen):
+    if not searcher.get_osu_token():
+        ui.post(show_result, gen, "", "", None, "")
+        ui.post(show_error, gen, "Failed to get API token")
         return
-    res = get_random_map(token)
-    if res and loading:
-        title, url, mid, thumb_url = res
-        t_bytes = None
-        if thumb_url:
-            try:
-                r = requests.get(thumb_url, timeout=10)
-                r.raise_for_status()
-                t_bytes = r.content
-            except:
-                t_bytes = None
-        root.after(0, update_ui, title, url, t_bytes, mid)
+    searcher.crawler.start()
+    res = searcher.get_random_map(flt, cancel)
+    if res and not cancel.cancelled:
+        searcher.session.log_shown(res)
+        import thumbnails
+        image = thumbnails.load_async(searcher.fetch_thumbnail, res.thumb).result()
+        ui.post(show_result, gen, res.display_title, res.url, image, str(res.set_id))
     else:
-        root.after(0, lambda: update_ui("", "", None, ""))
+        ui.post(show_result, gen, "", "", None, "")
+
+
+# === BATCH MODE ===
+MAX_BATCH = 50
+
+def fetch_batch(flt, count, cancel, gen):
+    # streams every distinct map of a K-map search into the result list as it arrives
+    if not searcher.get_osu_token():
+        ui.post(show_result, gen, "", "", None, "")
+        ui.post(show_error, gen, "Failed to get API token")
+        return
+    searcher.crawler.start()
+    for r in searcher.search_batch(flt, count, cancel):
+        searcher.session.log_shown(r)
+        ui.post(add_batch_result, gen, r, count)
+    ui.post(finish_batch, gen)
+
+
+def show_batch():
+    global batch_results
+    batch_results = []
+    batch_list.delete(0, "end")
+    if not batch_frame.winfo_manager():
+        batch_frame.pack(after=copy_frame, pady=5, fill="x")
+
+
+def add_batch_result(gen, r, count):
+    if gen != search_gen:
+        return
+    batch_results.append(r)
+    batch_list.insert("end", r.display_title)
+    status_label.config(text=f"Found {len(batch_results)}/{count} maps...")
+    if len(batch_results) == 1:
+        batch_list.selection_set(0)
+        select_batch_result(0)
+
+
+def finish_batch(gen):
+    if gen == search_gen:
+        status_label.config(text=f"Found {len(batch_results)} maps")
+        end_search()
+
+
+def select_batch_result(i):
+    global batch_shown
+    r = batch_shown = batch_results[i]
+    show_map(r.display_title, r.url, None, str(r.set_id))
+    thumbnail_label.config(text="Loading...")
+    import thumbnails
+    future = thumbnails.load_async(searcher.fetch_thumbnail, r.thumb)
+    future.add_done_callback(lambda f: ui.post(show_batch_thumbnail, r, f.result()))
+
+
+def show_batch_thumbnail(r, image):
+    # dropped if another entry was selected meanwhile
+    if r is batch_shown:
+        show_map(r.display_title, r.url, image, str(r.set_id))
+
+
+def on_batch_select(event=None):
+    sel = batch_list.curselection()
+    if sel:
+        select_batch_result(sel[0])
+
+
+def current_filter():
+    from orb_search import SearchFilter
+    modes = [m for m, var in mode_vars.items() if var.get()]
+    if not modes or selected_max_rating <= selected_min_rating:
+        return None
+    return SearchFilter(modes, selected_min_rating, selected_max_rating)
+
+
+def on_filter_change():
+    if prefetcher is None:
+        return
+    prefetcher.set_filter(current_filter())
 
 
 def on_search():
@@ -173,7 +214,7 @@ def on_search():
      show_feedback("Missing osu! API credentials")
      return
 
-    global selected_min_rating, selected_max_rating, loading
+    global selected_min_rating, selected_max_rating, loading, search_cancel, search_gen
     if not any(var.get() for var in mode_vars.values()):
         show_feedback("Error: Select at least one mode")
         return
@@ -184,7 +225,19 @@ def on_search():
         show_feedback("Error: Max stars = Min stars")
         return
     if loading:
-        loading = False
+        stop_search()
+        return
+    flt = current_filter()
+    searcher.session.put("last_filter", [sorted(flt.modes), min_scale.get(), max_scale.get()])
+    count = int(count_var.get())
+    if count == 1:
+        batch_frame.pack_forget()
+    # Served from the prefetch queue when a ready map matches the filter
+    item = prefetcher.pop(flt) if count == 1 else None
+    if item:
+        r = item.result
+        searcher.session.log_shown(r)
+        update_ui(r.display_title, r.url, item.image, str(r.set_id))
         return
     loading = True
     search_btn.config(text="Stop Search")
@@ -195,7 +248,18 @@ def on_search():
     thumbnail_label.config(image="", text="")
     copy_link_btn.config(state="disabled")
     copy_id_btn.config(state="disabled")
-    threading.Thread(target=fetch_and_display, daemon=True).start()
+    count_spin.config(state="disabled")
+    presets_btn.config(state="disabled")
+    search_gen += 1
+    from cancel import CancelToken
+    search_cancel = CancelToken()
+    if count > 1:
+        show_batch()
+        threading.Thread(target=fetch_batch, args=(flt, count, search_cancel, search_gen),
+                         daemon=True).start()
+        return
+    threading.Thread(target=fetch_and_display, args=(flt, search_cancel, search_gen),
+                     daemon=True).start()
 
 # === CREDENTIALS WINDOW ===
 def open_credentials_window():
@@ -224,12 +288,124 @@ def open_credentials_window():
         OSU_CLIENT_ID = cid_entry.get()
         OSU_CLIENT_SECRET = secret_entry.get()
         save_credentials(OSU_CLIENT_ID, OSU_CLIENT_SECRET)
+        if searcher is not None:
+            searcher.tokens.set_credentials(OSU_CLIENT_ID, OSU_CLIENT_SECRET)
         cred_win.destroy()
 
     tk.Button(cred_win, text="Save", command=save).pack(pady=10)
 
+# === STATS PANEL ===
+STATS_REFRESH_MS = 500
+
+def refresh_stats():
+    if not stats_frame.winfo_manager():
+        return
+    window = searcher.engine.limiter.window if searcher else 0
+    stats_label.config(text=f"{metrics.summary()}\nIn flight: {window}")
+    root.after(STATS_REFRESH_MS, refresh_stats)
+
+
+def toggle_stats():
+    if stats_frame.winfo_manager():
+        stats_frame.pack_forget()
+        stats_btn.config(text="Show Stats")
+    else:
+        stats_frame.pack(pady=5, fill="x")
+        stats_btn.config(text="Hide Stats")
+        root.after(0, refresh_stats)
+
+# === SESSION ===
+def apply_filter(modes, min_rating, max_rating):
+    for m, var in mode_vars.items():
+        var.set(m in modes)
+    min_scale.set(min_rating)
+    max_scale.set(min(max_rating, 10.0))
+    on_filter_change()
+
+
+def save_preset():
+    from tkinter import simpledialog
+    flt = current_filter()
+    if flt is None:
+        show_feedback("Error: Invalid filters")
+        return
+    name = simpledialog.askstring("Save Preset", "Preset name:", parent=root)
+    if name and name.strip():
+        searcher.session.save_preset(name.strip(), flt)
+        show_feedback("Preset saved!")
+
+
+def build_presets_menu():
+    # rebuilt each time the menu opens
+    presets_menu.delete(0, "end")
+    presets = searcher.session.presets()
+    for name, preset in presets.items():
+        presets_menu.add_command(label=name, command=lambda p=preset: apply_filter(*p))
+    if presets:
+        presets_menu.add_separator()
+        delete_menu = tk.Menu(presets_menu, tearoff=0)
+        for name in presets:
+            delete_menu.add_command(label=name, command=lambda n=name: searcher.session.delete_preset(n))
+        presets_menu.add_cascade(label="Delete", menu=delete_menu)
+    presets_menu.add_command(label="Save current filters...", command=save_preset)
+
+
+def show_last_map(shown_at, set_id, beatmap_id, title, url, thumb):
+    # the map on display when the app was last closed
+    show_map(title, url, None, str(set_id))
+    thumbnail_label.config(text="Loading...")
+    import thumbnails
+    future = thumbnails.load_async(searcher.fetch_thumbnail, thumb)
+    future.add_done_callback(lambda f: ui.post(show_last_thumbnail, url, title, set_id, f.result()))
+
+
+def show_last_thumbnail(url, title, set_id, image):
+    if url == current_url and not loading:
+        show_map(title, url, image, str(set_id))
+
+
+# === WARM-UP ===
+def build_searcher():
+    # runs on the warm-up thread: requests, PIL and the caches load after the first paint
+    global OSU_CLIENT_ID, OSU_CLIENT_SECRET
+    OSU_CLIENT_ID, OSU_CLIENT_SECRET = load_credentials()
+    import importlib
+    from orb_search import Searcher
+    # loaded here only so the Tk thread doesn't import them at first use
+    for module in ("prefetch", "thumbnails", "PIL.ImageTk"):
+        importlib.import_module(module)
+    return Searcher(OSU_CLIENT_ID, OSU_CLIENT_SECRET, TOKEN_FILE)
+
+
+def on_ready(s):
+    global searcher, prefetcher
+    from prefetch import Prefetcher
+    searcher = s
+    prefetcher = Prefetcher(searcher)
+    search_btn.config(text="Search Random Beatmap", state="normal")
+    presets_btn.config(state="normal")
+    # pick up where the last session left off
+    last = searcher.session.get("last_filter")
+    if last:
+        apply_filter(*last)
+    recent = searcher.session.recent_shown(1)
+    if recent:
+        show_last_map(*recent[0])
+    on_filter_change()
+
+
+def on_startup_error(exc):
+    # searching stays disabled; the app has nothing to search with
+    search_btn.config(text="Startup failed")
+    status_label.config(text=f"Startup failed: {exc}")
+
+
+warm = startup.WarmUp(build_searcher, lambda s: ui.post(on_ready, s),
+                      lambda exc: ui.post(on_startup_error, exc))
+
 # === GUI SETUP ===
 root = tk.Tk()
+ui = UiChannel(root)
 root.title("osu! Random Beatmap Finder")
 root.configure(bg="#282c34")
 root.resizable(False, False)
@@ -246,7 +422,7 @@ mode_frame.pack(pady=5)
 for m in ["osu", "taiko", "fruits", "mania"]:
     var = tk.BooleanVar(value=True)
     mode_vars[m] = var
-    cb = tk.Checkbutton(mode_frame, text=m.capitalize(), variable=var,
+    cb = tk.Checkbutton(mode_frame, text=m.capitalize(), variable=var, command=on_filter_change,
                         bg="#282c34", fg="white", selectcolor="#3e4451",
                         activebackground="#282c34", activeforeground="white")
     cb.pack(side="left", padx=5)
@@ -258,6 +434,7 @@ def on_min_rating(val):
     global selected_min_rating
     selected_min_rating = float(val)
     min_label.config(text=f"Min Stars: {selected_min_rating}")
+    on_filter_change()
 
 def on_max_rating(val):
     global selected_max_rating
@@ -268,6 +445,7 @@ def on_max_rating(val):
     else:
         selected_max_rating = val
         max_label.config(text=f"Max Stars: {selected_max_rating}")
+    on_filter_change()
 
 min_label = tk.Label(rating_frame, text="Min Stars: 0.0", fg="white", bg="#282c34", font=font)
 min_label.pack(side="left", padx=(0,10))
@@ -284,7 +462,22 @@ max_scale = tk.Scale(rating_frame, from_=1, to=10, resolution=0.1, orient="horiz
 max_scale.set(10.0)
 max_scale.pack(side="left")
 
-search_btn = tk.Button(main, text="Search Random Beatmap", command=on_search,
+# Maps per search
+count_frame = tk.Frame(main, bg="#282c34")
+count_frame.pack(pady=(5,0))
+tk.Label(count_frame, text="Maps per search:", fg="white", bg="#282c34", font=font).pack(side="left", padx=(0,10))
+count_var = tk.IntVar(value=1)
+count_spin = tk.Spinbox(count_frame, from_=1, to=MAX_BATCH, textvariable=count_var, width=4,
+                        state="readonly", font=font)
+count_spin.pack(side="left")
+presets_btn = tk.Menubutton(count_frame, text="Presets ▾", font=("Segoe UI",10), bg="#4b5263", fg="white",
+                            relief="flat", activebackground="#5c6370", activeforeground="white",
+                            state="disabled")
+presets_menu = tk.Menu(presets_btn, tearoff=0, postcommand=build_presets_menu)
+presets_btn.config(menu=presets_menu)
+presets_btn.pack(side="left", padx=(20,0))
+
+search_btn = tk.Button(main, text="Starting up...", command=on_search, state="disabled",
                        font=("Segoe UI",12,"bold"), bg="#61afef", fg="white",
                        relief="flat", activebackground="#5298d1", activeforeground="white", pady=8)
 search_btn.pack(pady=10)
@@ -312,8 +505,32 @@ copy_id_btn = tk.Button(copy_frame, text="Copy ID",
                         font=("Segoe UI",10), bg="#4b5263", fg="white", relief="flat",
                         activebackground="#5c6370", activeforeground="white", state="disabled")
 copy_id_btn.pack(side="left", padx=5)
+# Result list of a K-map search, shown once one starts
+batch_frame = tk.Frame(main, bg="#282c34")
+batch_list = tk.Listbox(batch_frame, height=8, font=("Segoe UI",10), bg="#3e4451", fg="white",
+                        selectbackground="#61afef", highlightthickness=0, activestyle="none",
+                        exportselection=False)
+batch_scroll = tk.Scrollbar(batch_frame, command=batch_list.yview)
+batch_list.config(yscrollcommand=batch_scroll.set)
+batch_list.pack(side="left", fill="both", expand=True)
+batch_scroll.pack(side="right", fill="y")
+batch_list.bind("<<ListboxSelect>>", on_batch_select)
+batch_list.bind("<Double-Button-1>", open_map)
 
 feedback_label = tk.Label(main, text="", font=font, fg="#77dd77", bg="#282c34")
 feedback_label.pack(pady=5)
-
+stats_btn = tk.Button(main, text="Show Stats", command=toggle_stats,
+                      font=("Segoe UI",9), bg="#4b5263", fg="white", relief="flat",
+                      activebackground="#5c6370", activeforeground="white")
+stats_btn.pack()
+stats_frame = tk.Frame(main, bg="#3e4451", bd=1, relief="ridge")
+stats_label = tk.Label(stats_frame, text="", font=("Consolas",9), fg="#abb2bf", bg="#3e4451",
+                       justify="left", anchor="w")
+stats_label.pack(padx=8, pady=6, fill="x")
+
+root.update()
+startup.mark("paint")
+warm.start()
 root.mainloop()
+if searcher is not None:
+    searcher.save()
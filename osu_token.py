@@ -0,0 +1,106 @@
+import json
+import os
+import threading
+import time
+
+import requests
+
+from fetch_engine import OSU_URL, api_request
+from metrics import metrics
+
+# === CONFIG ===
+TOKEN_URL = f"{OSU_URL}/oauth/token"
+REFRESH_MARGIN = 5 * 60
+
+
+# === TOKEN MANAGER ===
+# Caches the client-credentials token until shortly before it expires (they
+# last about a day), optionally persisting it so restarts skip the POST too.
+class TokenManager:
+    def __init__(self, client_id, client_secret, path=None):
+        self.client_id = client_id
+        self.client_secret = client_secret
+        self.path = path
+        self._token = None
+        self._expires_at = 0.0
+        self._lock = threading.Lock()
+        self._load()
+
+    def set_credentials(self, client_id, client_secret):
+        with self._lock:
+            self.client_id = client_id
+            self.client_secret = client_secret
+            self._token = None
+            self._expires_at = 0.0
+
+    def _load(self):
+        if not self.path or not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, "r") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return
+        if data.get("client_id") == self.client_id:
+            self._token = data.get("access_token")
+            self._expires_at = data.get("expires_at", 0.0)
+
+    def _save(self):
+        if not self.path:
+            return
+        try:
+            with open(self.path, "w") as f:
+                json.dump({"client_id": self.client_id, "access_token": self._token,
+                           "expires_at": self._expires_at}, f)
+        except OSError:
+            pass
+
+    def _request(self):
+        with metrics.span("token_request") as span:
+            try:
+                res = api_request(
+                    "POST", TOKEN_URL,
+                    json={"client_id": self.client_id,
+                          "client_secret": self.client_secret,
+                          "grant_type": "client_credentials",
+                          "scope": "public"}, timeout=10)
+                res.raise_for_status()
+                data = res.json()
+            except (requests.RequestException, ValueError):
+                span.outcome = "error"
+                return None
+        self._token = data.get("access_token")
+        self._expires_at = time.time() + data.get("expires_in", 0)
+        self._save()
+        return self._token
+
+    def get(self):
+        # refreshes proactively once the token is within REFRESH_MARGIN of expiry
+        with self._lock:
+            if self._token and time.time() < self._expires_at - REFRESH_MARGIN:
+                metrics.inc("token_cache_hits_total")
+                return self._token
+            if not self.client_id or not self.client_secret:
+                return None
+            return self._request()
+
+    def invalidate(self, token):
+        # only the first caller that saw a 401 for this token drops it
+        with self._lock:
+            if self._token == token:
+                self._token = None
+                self._expires_at = 0.0
+
+    def authorized_get(self, url, **kwargs):
+        # GET with the cached bearer token, retried once with a fresh one on 401
+        headers = dict(kwargs.pop("headers", None) or {})
+        for attempt in range(2):
+            token = self.get()
+            if not token:
+                return None
+            headers["Authorization"] = f"Bearer {token}"
+            res = api_request("GET", url, headers=headers, **kwargs)
+            if res.status_code != 401 or attempt:
+                return res
+            res.close()
+            self.invalidate(token)
@@ -0,0 +1,67 @@
+import threading
+from collections import deque, namedtuple
+
+import thumbnails
+from cancel import CancelToken
+
+# === CONFIG ===
+PREFETCH_SIZE = 3
+TOKEN_RETRY = 5.0
+
+Prefetched = namedtuple("Prefetched", "result image")
+
+
+# === PREFETCHER ===
+# Background producer keeping a few fully resolved maps (result + decoded
+# thumbnail) ready for the current filter, so a search can usually be answered
+# straight from the queue.
+class Prefetcher:
+    def __init__(self, searcher, size=PREFETCH_SIZE):
+        self.searcher = searcher
+        self.size = size
+        self._items = deque()
+        self._flt = None
+        self._cancel = CancelToken()
+        self._cond = threading.Condition()
+        self._thread = None
+
+    def set_filter(self, flt):
+        # None pauses the producer; a new filter keeps queued maps that still
+        # match and abandons the search in progress
+        with self._cond:
+            if flt == self._flt:
+                return
+            self._flt = flt
+            self._cancel.cancel()
+            self._cancel = CancelToken()
+            self._items = deque(i for i in self._items if flt and flt.matches(i.result))
+            self._cond.notify_all()
+            if flt and self._thread is None:
+                self._thread = threading.Thread(target=self._run, daemon=True)
+                self._thread.start()
+
+    def pop(self, flt):
+        with self._cond:
+            if flt != self._flt or not self._items:
+                return None
+            item = self._items.popleft()
+            self._cond.notify_all()
+            return item
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while self._flt is None or len(self._items) >= self.size:
+                    self._cond.wait()
+                flt, cancel = self._flt, self._cancel
+            if not self.searcher.get_osu_token():
+                cancel.wait(TOKEN_RETRY)
+                continue
+            self.searcher.crawler.start()
+            r = self.searcher.get_random_map(flt, cancel)
+            if r is None:
+                continue
+            image = thumbnails.load_async(self.searcher.fetch_thumbnail, r.thumb).result()
+            with self._cond:
+                if not cancel.cancelled and all(i.result.set_id != r.set_id for i in self._items):
+                    self._items.append(Prefetched(r, image))
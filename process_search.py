@@ -0,0 +1,204 @@
+import multiprocessing
+import os
+import queue
+import threading
+import time
+
+import beatmap_index
+import fetch_engine
+from cancel import CancelToken
+from metrics import metrics
+from orb_search import MapResult, SearchFilter, Searcher
+from rate_limit import RateLimiter, BURST, MAX_CONCURRENCY, RATE_PER_MINUTE, START_CONCURRENCY
+
+# === CONFIG ===
+STATS_INTERVAL = 1.0
+SHARE_INTERVAL = 2.0
+POLL_INTERVAL = 0.5
+ROUND_SIZE = 32
+SHUTDOWN_TIMEOUT = 15.0
+
+
+def _stats(metrics):
+    return {"lookups": metrics.total("fetch_map_total"),
+            "hits": metrics.total("fetch_map_total", outcome="hit"),
+            "cached": metrics.total("response_cache_total", outcome="hit"),
+            "requests": metrics.total("api_requests_total"),
+            "results": metrics.total("batch_results_total")}
+
+
+# === WORKER ===
+# Runs in its own (spawned) process with its own connection pool, token cache
+# copy and 1/n of the rate limit. It only hands out sets in its shard of the ID
+# space (id % n == k), both from the index and when probing random IDs, so
+# workers don't duplicate each other. It runs search_batch in rounds of
+# ROUND_SIZE: each round starts from its index, which the coordinator tops up
+# over `inbox` with the sets its refresher finds, and then keeps every hit of
+# its random-ID probes until it is full or new sets arrive. Its history is never saved. Everything it finds goes
+# back to the coordinator over `out`:
+#   ("result", shard, tuple(MapResult)), ("stats", shard, dict),
+#   ("learned", shard, (invalid-ID snapshot, new index sets)) once on exit
+def _receive(searcher, inbox, interrupt):
+    # (index entries, beatmapset responses) shared by the coordinator
+    for sets, responses in iter(inbox.get, None):
+        for data in responses:
+            searcher.responses.put(data)
+        searcher.index.merge(sets)
+        if sets:
+            interrupt()
+
+
+def _worker(shard, shards, credentials, data_dir, flt, sample_mode, out, stop, inbox):
+    fetch_engine.api_limiter = RateLimiter(
+        per_minute=RATE_PER_MINUTE / shards, burst=max(1, BURST // shards),
+        max_limit=max(1, MAX_CONCURRENCY // shards), start=max(1, START_CONCURRENCY // shards))
+    # shared sets arrive every SHARE_INTERVAL; pick each batch up as it comes
+    beatmap_index.TABLE_REBUILD_INTERVAL = SHARE_INTERVAL
+    client_id, client_secret, token_file = credentials
+    searcher = Searcher(client_id, client_secret, token_file, data_dir,
+                        sample_mode=sample_mode, shard=(shard, shards))
+    searcher.history.mask_shard(shard, shards)
+    known = set(searcher.index.sets)
+    flt = SearchFilter(*flt)
+    # stop aborts the requests in flight instead of waiting for the next hit
+    cancel = CancelToken()
+    threading.Thread(target=lambda: (stop.wait(), cancel.cancel()), daemon=True).start()
+    round_token = None
+
+    def interrupt():
+        # ends the round's random probing so the next one picks the new sets
+        token = round_token
+        if token is not None:
+            token.cancel()
+
+    threading.Thread(target=_receive, args=(searcher, inbox, interrupt), daemon=True).start()
+    last = time.monotonic()
+    try:
+        while not cancel.cancelled:
+            round_token = cancel.child()
+            results = searcher.search_batch(flt, ROUND_SIZE, round_token, distinct="set")
+            try:
+                for r in results:
+                    out.put(("result", shard, tuple(r)))
+                    if time.monotonic() - last >= STATS_INTERVAL:
+                        out.put(("stats", shard, _stats(metrics)))
+                        last = time.monotonic()
+            finally:
+                results.close()
+                round_token.cancel()
+    except KeyboardInterrupt:
+        pass
+    out.put(("stats", shard, _stats(metrics)))
+    new_sets = {k: v for k, v in searcher.index.sets.items() if k not in known}
+    out.put(("learned", shard, (searcher.invalid_ids.snapshot(), new_sets)))
+
+
+# === COORDINATOR ===
+# Bulk generation across worker processes, for when JSON parsing and filtering
+# in one process (one GIL) is the bottleneck. Sets the coordinating searcher
+# indexes meanwhile (e.g. its refresher) are passed on to the worker owning
+# their shard every SHARE_INTERVAL. Results are deduplicated against the
+# coordinating searcher's history; what the workers learned about the ID
+# space is merged back into its index and invalid-ID cache, and the workers'
+# final counters into this process's metrics as worker_<stat>_total{shard}.
+class ProcessSearcher:
+    def __init__(self, searcher, workers=None):
+        self.searcher = searcher
+        self.workers = workers or os.cpu_count() or 2
+        self.stats = {}
+
+    def generate(self, flt, count):
+        s = self.searcher
+        # fetched once here so the workers pick it up from the token file
+        s.get_osu_token()
+        s.save()
+        ctx = multiprocessing.get_context("spawn")
+        out = ctx.Queue()
+        stop = ctx.Event()
+        inboxes = [ctx.Queue() for _ in range(self.workers)]
+        credentials = (s.tokens.client_id, s.tokens.client_secret, s.tokens.path)
+        procs = [ctx.Process(target=_worker, daemon=True,
+                             args=(k, self.workers, credentials, s.data_dir,
+                                   (tuple(flt.modes), flt.min_rating, flt.max_rating),
+                                   s.sample_mode, out, stop, inboxes[k]))
+                 for k in range(self.workers)]
+        for p in procs:
+            p.start()
+        # the workers loaded the index saved above
+        shared = set(s.index.sets)
+        shared_at = time.monotonic()
+        produced = 0
+        try:
+            while produced < count:
+                if time.monotonic() - shared_at >= SHARE_INTERVAL:
+                    self._share(inboxes, shared)
+                    shared_at = time.monotonic()
+                try:
+                    msg = self._handle(out.get(timeout=POLL_INTERVAL))
+                except queue.Empty:
+                    if not any(p.is_alive() for p in procs):
+                        raise RuntimeError("every search worker exited")
+                    continue
+                if msg is None or msg.set_id in s.history:
+                    continue
+                s.history.add(msg.set_id)
+                produced += 1
+                yield msg
+        finally:
+            stop.set()
+            for inbox in inboxes:
+                # a worker that already exited never reads it
+                inbox.cancel_join_thread()
+            self._drain(out, procs)
+            for shard, stats in self.stats.items():
+                for name, value in stats.items():
+                    metrics.inc(f"worker_{name}_total", value, shard=str(shard))
+
+    def summary(self):
+        # one line of worker totals for the CLI
+        totals = {name: sum(stats.get(name, 0) for stats in self.stats.values())
+                  for name in ("results", "lookups", "hits", "cached", "requests")}
+        return (f"Workers: {len(self.stats)}/{self.workers}  " +
+                "  ".join(f"{name} {value}" for name, value in totals.items()))
+
+    def _share(self, inboxes, shared):
+        new = self.searcher.index.entries(exclude=shared)
+        if not new:
+            return
+        shared.update(new)
+        for k, inbox in enumerate(inboxes):
+            sets = {set_id: entry for set_id, entry in new.items()
+                    if set_id % self.workers == k}
+            responses = [data for data in map(self.searcher.responses.get, sets) if data]
+            inbox.put((sets, responses))
+
+    def _handle(self, msg):
+        kind, shard, payload = msg
+        if kind == "result":
+            return MapResult(*payload)
+        if kind == "stats":
+            self.stats[shard] = payload
+        elif kind == "learned":
+            bits, new_sets = payload
+            self.searcher.invalid_ids.merge(*bits)
+            self.searcher.index.merge(new_sets)
+        return None
+
+    def _drain(self, out, procs):
+        # wait for every worker's "learned" message; late results are dropped
+        pending = len(procs)
+        deadline = time.monotonic() + SHUTDOWN_TIMEOUT
+        while pending and time.monotonic() < deadline:
+            try:
+                msg = out.get(timeout=POLL_INTERVAL)
+            except queue.Empty:
+                if not any(p.is_alive() for p in procs):
+                    break
+                continue
+            if msg[0] == "learned":
+                pending -= 1
+            self._handle(msg)
+        for p in procs:
+            p.join(timeout=1.0)
+            if p.is_alive():
+                p.terminate()
@@ -0,0 +1,104 @@
+import threading
+import time
+
+# === CONFIG ===
+# osu! API v2 allows 1200 requests/minute with some burst on top
+RATE_PER_MINUTE = 1200
+BURST = 60
+MIN_CONCURRENCY = 1
+MAX_CONCURRENCY = 32
+START_CONCURRENCY = 15
+DEFAULT_BACKOFF = 10.0
+LATENCY_FACTOR = 3.0     # responses this much slower than the baseline count as congestion
+DECREASE_FACTOR = 0.75
+POLL_INTERVAL = 0.25
+
+
+def retry_after(res):
+    try:
+        return float(res.headers.get("Retry-After"))
+    except (AttributeError, TypeError, ValueError):
+        return None
+
+
+# === LIMITER ===
+# Token bucket for the request rate plus an AIMD window for the number of
+# requests in flight: +1/limit per healthy response, *DECREASE_FACTOR on slow
+# responses or errors (at most once per baseline latency), halved on 429.
+class RateLimiter:
+    def __init__(self, per_minute=RATE_PER_MINUTE, burst=BURST, min_limit=MIN_CONCURRENCY,
+                 max_limit=MAX_CONCURRENCY, start=START_CONCURRENCY):
+        self.rate = per_minute / 60.0
+        self.burst = burst
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.limit = float(start)
+        self.in_flight = 0
+        self.baseline = None
+        self._tokens = float(burst)
+        self._stamp = time.monotonic()
+        self._blocked_until = 0.0
+        self._last_decrease = 0.0
+        self._cond = threading.Condition()
+
+    @property
+    def window(self):
+        return max(self.min_limit, int(self.limit))
+
+    def _refill(self, now):
+        self._tokens = min(self.burst, self._tokens + (now - self._stamp) * self.rate)
+        self._stamp = now
+
+    def acquire(self, cancel=None):
+        # returns False instead of a slot once `cancel` (a CancelToken) is cancelled
+        with self._cond:
+            while True:
+                if cancel is not None and cancel.cancelled:
+                    return False
+                now = time.monotonic()
+                self._refill(now)
+                if now < self._blocked_until:
+                    wait = self._blocked_until - now
+                elif self.in_flight >= self.window:
+                    wait = None
+                elif self._tokens < 1:
+                    wait = (1 - self._tokens) / self.rate
+                else:
+                    self._tokens -= 1
+                    self.in_flight += 1
+                    return True
+                self._cond.wait(POLL_INTERVAL if wait is None else min(wait, POLL_INTERVAL))
+
+    def _decrease(self, now, factor):
+        if now - self._last_decrease >= (self.baseline or 0):
+            self.limit = max(self.min_limit, self.limit * factor)
+            self._last_decrease = now
+
+    def release(self, latency, status=None, wait=None, remaining=None, aborted=False):
+        # status None means the request failed without a response (timeout, reset);
+        # aborted requests (cancelled searches) only give their slot back
+        with self._cond:
+            now = time.monotonic()
+            self.in_flight -= 1
+            if aborted:
+                pass
+            elif status == 429:
+                self._decrease(now, 0.5)
+                self._blocked_until = max(self._blocked_until, now + (wait or DEFAULT_BACKOFF))
+                self._tokens = 0.0
+            elif status is None or status >= 500:
+                self._decrease(now, DECREASE_FACTOR)
+            else:
+                if self.baseline is None:
+                    self.baseline = latency
+                else:
+                    self.baseline += 0.05 * (latency - self.baseline)
+                if latency > LATENCY_FACTOR * self.baseline:
+                    self._decrease(now, DECREASE_FACTOR)
+                else:
+                    self.limit = min(self.max_limit, self.limit + 1.0 / self.limit)
+            try:
+                self._tokens = min(self._tokens, float(remaining))
+            except (TypeError, ValueError):
+                pass
+            self._cond.notify_all()
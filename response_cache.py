@@ -0,0 +1,113 @@
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+
+# === CONFIG ===
+RESPONSE_FILE = "beatmapset_cache.json"
+MAX_ENTRIES = 50000
+HOUR = 60 * 60
+# how long a cached beatmapset is trusted, by status; ranked / loved / approved
+# sets practically never change, qualified ones get ranked or disqualified
+TTLS = {
+    "ranked": 30 * 24 * HOUR,
+    "approved": 30 * 24 * HOUR,
+    "loved": 30 * 24 * HOUR,
+    "qualified": 12 * HOUR,
+}
+DEFAULT_TTL = 6 * HOUR
+
+
+def compact(data):
+    # API beatmapset JSON -> [fetched_at, status, title, artist, cover,
+    #                         [[id, mode_int, rating, total_length, bpm], ...]]
+    covers = data.get("covers") or {}
+    return [time.time(), data.get("status"), data.get("title"), data.get("artist"),
+            covers.get("cover@2x") or covers.get("cover"),
+            [[b.get("id"), b.get("mode_int"), b.get("difficulty_rating", 0),
+              b.get("total_length"), b.get("bpm")] for b in data.get("beatmaps", [])]]
+
+
+def expand(set_id, record):
+    # compact record -> the subset of the API JSON the searcher reads
+    _, status, title, artist, cover, diffs = record
+    return {"id": set_id, "status": status, "title": title or "N/A", "artist": artist or "N/A",
+            "covers": {"cover@2x": cover} if cover else {},
+            "beatmaps": [{"id": d[0], "mode_int": d[1], "difficulty_rating": d[2],
+                          "total_length": d[3], "bpm": d[4]} for d in diffs]}
+
+
+# === CACHE ===
+# Parsed /beatmapsets/{id} responses keyed by set ID, kept as compact lists and
+# persisted as JSON. Entries expire by status (TTLS); past max_entries the
+# least recently used ones are dropped. Only sets a search can return are put
+# here; the far more common ineligible ones live in InvalidIdCache's bitmaps,
+# where they don't push useful entries out.
+class ResponseCache:
+    def __init__(self, path=RESPONSE_FILE, max_entries=MAX_ENTRIES):
+        self.path = path
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self._dirty = False
+        self.load()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def load(self):
+        if not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, "r") as f:
+                entries = json.load(f)
+        except (OSError, ValueError):
+            return
+        with self._lock:
+            # saved oldest-first, so the LRU order survives a restart
+            self._entries = OrderedDict((int(k), v) for k, v in entries)
+
+    def save(self):
+        with self._lock:
+            if not self._dirty:
+                return
+            entries = list(self._entries.items())
+            self._dirty = False
+        tmp = self.path + ".tmp"
+        try:
+            with open(tmp, "w") as f:
+                json.dump(entries, f, separators=(",", ":"))
+            os.replace(tmp, self.path)
+        except OSError:
+            pass
+
+    def get(self, set_id):
+        # fresh cached beatmapset, or None
+        with self._lock:
+            record = self._entries.get(set_id)
+            if record is None:
+                return None
+            if time.time() - record[0] >= TTLS.get(record[1], DEFAULT_TTL):
+                del self._entries[set_id]
+                self._dirty = True
+                return None
+            self._entries.move_to_end(set_id)
+        return expand(set_id, record)
+
+    def put(self, data):
+        set_id = data.get("id")
+        if not set_id or "beatmaps" not in data:
+            return
+        record = compact(data)
+        with self._lock:
+            self._entries[set_id] = record
+            self._entries.move_to_end(set_id)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+            self._dirty = True
+
+    def discard(self, set_id):
+        with self._lock:
+            if self._entries.pop(set_id, None) is not None:
+                self._dirty = True
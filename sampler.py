@@ -0,0 +1,221 @@
+import json
+import os
+import random
+import threading
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# === CONFIG ===
+HISTORY_FILE = "seen_ids.bin"
+MAX_ID = 3000000
+SAMPLE_MODES = ("set", "difficulty", "stratified")
+STAR_BUCKET = 1.0
+DRAW_TRIES = 32
+
+
+# === HISTORY ===
+# Persistent no-repeat history: one bit per beatmapset ID that has already been
+# handed out. 3M IDs fit in ~370 KB and, unlike a Bloom filter, never reject a
+# set that hasn't been seen.
+class SeenHistory:
+    def __init__(self, path=HISTORY_FILE, max_id=MAX_ID):
+        self.path = path
+        self.max_id = max_id
+        self.count = 0
+        self._bits = bytearray(max_id // 8 + 1)
+        self._shard = None
+        self._lock = threading.Lock()
+        self.load()
+
+    def __len__(self):
+        return self.count
+
+    def __contains__(self, set_id):
+        return 0 < set_id <= self.max_id and bool(self._bits[set_id >> 3] & (1 << (set_id & 7)))
+
+    def add(self, set_id):
+        if not 0 < set_id <= self.max_id:
+            return
+        with self._lock:
+            byte, bit = set_id >> 3, 1 << (set_id & 7)
+            if not self._bits[byte] & bit:
+                self._bits[byte] |= bit
+                self.count += 1
+
+    def forget(self, set_ids):
+        # IDs outside the shard (see mask_shard) stay marked
+        if self._shard:
+            k, n = self._shard
+            set_ids = [set_id for set_id in set_ids if set_id % n == k]
+        with self._lock:
+            for set_id in set_ids:
+                byte, bit = set_id >> 3, 1 << (set_id & 7)
+                if 0 < set_id <= self.max_id and self._bits[byte] & bit:
+                    self._bits[byte] &= ~bit
+                    self.count -= 1
+
+    def contains_many(self, set_ids):
+        # vectorized __contains__ over a NumPy array of IDs
+        ids = np.asarray(set_ids, dtype=np.int64)
+        inside = (ids > 0) & (ids <= self.max_id)
+        safe = np.where(inside, ids, 0)
+        bits = np.frombuffer(self._bits, np.uint8)
+        return inside & ((bits[safe >> 3] >> (safe & 7).astype(np.uint8)) & 1).astype(bool)
+
+    def mask_shard(self, k, n):
+        # marks every ID outside shard k of n as seen, so pools and draws only
+        # hand out IDs with id % n == k (used by search worker processes);
+        # forget() and clear() keep them marked
+        self._shard = (k, n)
+        self._apply_shard()
+
+    def _apply_shard(self):
+        k, n = self._shard
+        if np is not None:
+            ids = np.arange(len(self._bits) * 8)
+            mask = np.packbits((ids % n != k) & (ids <= self.max_id), bitorder="little")
+            with self._lock:
+                self._bits = bytearray(np.bitwise_or(np.frombuffer(self._bits, np.uint8), mask).tobytes())
+                self.count = int(np.unpackbits(np.frombuffer(self._bits, np.uint8)).sum())
+            return
+        for set_id in range(1, self.max_id + 1):
+            if set_id % n != k:
+                self.add(set_id)
+
+    def clear(self):
+        with self._lock:
+            self._bits = bytearray(len(self._bits))
+            self.count = 0
+        if self._shard:
+            self._apply_shard()
+
+    def load(self):
+        if not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, "rb") as f:
+                header = json.loads(f.readline())
+                bits = bytearray(f.read())
+        except (OSError, ValueError):
+            return
+        if header.get("max_id") != self.max_id or len(bits) != len(self._bits):
+            return
+        with self._lock:
+            self._bits = bits
+            self.count = header.get("count", 0)
+
+    def save(self):
+        with self._lock:
+            header = {"max_id": self.max_id, "count": self.count}
+            blob = bytes(self._bits)
+        tmp = self.path + ".tmp"
+        try:
+            with open(tmp, "wb") as f:
+                f.write(json.dumps(header).encode() + b"\n")
+                f.write(blob)
+            os.replace(tmp, self.path)
+        except OSError:
+            pass
+
+
+# === POOL ===
+# Candidates for one filter, as (set_id, beatmap_id) picks grouped into strata:
+#   by="set":        one stratum, each matching set once (beatmap_id None)
+#   by="difficulty": one stratum, one pick per matching difficulty
+#   by="stratified": one stratum per STAR_BUCKET of star rating; a bucket is
+#                    chosen uniformly, then a difficulty within it
+# Each stratum is a pair of columns (set IDs, beatmap IDs or None): NumPy arrays
+# when available (the rows of one set must be adjacent, as BeatmapTable and
+# OfflineStore produce them), so building a pool from a table mask is a few
+# vectorized ops and a draw is two randranges plus an index. Picks already in
+# the history are rejected; when rejections pile up the seen picks are dropped
+# in one pass, so draws stay O(1) amortized, and once everything has been seen
+# the pool starts a new cycle (or, with cycle=False, draws None from then on).
+class CandidatePool:
+    def __init__(self, set_ids, beatmap_ids, ratings, by="set"):
+        if by not in SAMPLE_MODES:
+            raise ValueError(f"unknown sample mode {by!r}")
+        if np is not None:
+            strata = self._np_strata(np.asarray(set_ids, dtype=np.int64),
+                                     np.asarray(beatmap_ids, dtype=np.int64),
+                                     np.asarray(ratings, dtype=np.float64), by)
+        else:
+            strata = self._py_strata(list(set_ids), list(beatmap_ids), list(ratings), by)
+        self.by = by
+        self._full = [s for s in strata if len(s[0])]
+        self._strata = self._full
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _np_strata(set_ids, beatmap_ids, ratings, by):
+        if by == "set":
+            # rows of one set are adjacent, so dropping repeats dedupes them
+            first = np.ones(len(set_ids), dtype=bool)
+            first[1:] = set_ids[1:] != set_ids[:-1]
+            return [(set_ids[first], None)]
+        if by == "difficulty":
+            return [(set_ids, beatmap_ids)]
+        buckets = np.floor_divide(ratings, STAR_BUCKET).astype(np.int16)
+        order = np.argsort(buckets, kind="stable")
+        set_ids, beatmap_ids, buckets = set_ids[order], beatmap_ids[order], buckets[order]
+        bounds = np.flatnonzero(np.diff(buckets)) + 1
+        return list(zip(np.split(set_ids, bounds), np.split(beatmap_ids, bounds)))
+
+    @staticmethod
+    def _py_strata(set_ids, beatmap_ids, ratings, by):
+        if by == "set":
+            return [(list(dict.fromkeys(set_ids)), None)]
+        if by == "difficulty":
+            return [(set_ids, beatmap_ids)]
+        buckets = {}
+        for sid, bid, rating in zip(set_ids, beatmap_ids, ratings):
+            b = buckets.setdefault(int(rating // STAR_BUCKET), ([], []))
+            b[0].append(sid)
+            b[1].append(bid)
+        return [buckets[k] for k in sorted(buckets)]
+
+    def __len__(self):
+        return sum(len(s[0]) for s in self._strata)
+
+    def _pick(self):
+        strata = self._strata
+        sids, bids = strata[random.randrange(len(strata))]
+        i = random.randrange(len(sids))
+        return int(sids[i]), (None if bids is None else int(bids[i]))
+
+    def _compact(self, history, cycle):
+        kept = []
+        for sids, bids in self._strata:
+            if np is not None:
+                keep = ~history.contains_many(sids)
+                sids, bids = sids[keep], (None if bids is None else bids[keep])
+            else:
+                keep = [i for i, sid in enumerate(sids) if sid not in history]
+                sids = [sids[i] for i in keep]
+                bids = None if bids is None else [bids[i] for i in keep]
+            if len(sids):
+                kept.append((sids, bids))
+        if not kept and cycle:
+            history.forget({int(sid) for sids, _ in self._full for sid in sids})
+            kept = self._full
+        self._strata = kept
+
+    def draw(self, history=None, cycle=True):
+        # (set_id, beatmap_id or None), or None for an empty pool or, with
+        # cycle=False, one whose picks are all in the history
+        with self._lock:
+            if not self._strata and cycle and self._full and history is not None:
+                # drained by an earlier draw with cycle=False
+                self._compact(history, cycle)
+            for _ in range(2):
+                if not self._strata:
+                    return None
+                for _ in range(DRAW_TRIES):
+                    pick = self._pick()
+                    if history is None or pick[0] not in history:
+                        return pick
+                self._compact(history, cycle)
+            return self._pick() if self._strata else None
@@ -0,0 +1,100 @@
+import json
+import sqlite3
+import threading
+import time
+
+# === CONFIG ===
+SESSION_FILE = "session.sqlite"
+SHOWN_KEEP = 10000
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS state (key TEXT PRIMARY KEY, value TEXT);
+CREATE TABLE IF NOT EXISTS presets (
+    name TEXT PRIMARY KEY, modes TEXT, min_rating REAL, max_rating REAL);
+CREATE TABLE IF NOT EXISTS shown (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT, shown_at REAL, set_id INTEGER, beatmap_id INTEGER,
+    title TEXT, url TEXT, thumb TEXT);
+"""
+
+
+# === SESSION STORE ===
+# What a run learns beyond the caches, kept across restarts in one SQLite file
+# in WAL mode (cheap small commits, readers never block the writer):
+#   state   - small JSON values: the background crawl's checkpoint and request
+#             ledger, the last filter used
+#   presets - named filters
+#   shown   - maps displayed to the user, newest last, capped at SHOWN_KEEP
+# Every write commits at once, so nothing is lost if the app is killed. If the
+# file can't be opened (read-only directory, corrupt database) the store runs
+# in memory for this run instead of failing startup; path is then ":memory:".
+class SessionStore:
+    def __init__(self, path=SESSION_FILE):
+        self.path = path
+        self._lock = threading.Lock()
+        try:
+            self._conn = self._open(path)
+        except sqlite3.Error:
+            self.path = ":memory:"
+            self._conn = self._open(self.path)
+
+    @staticmethod
+    def _open(path):
+        conn = sqlite3.connect(path, check_same_thread=False)
+        try:
+            if path != ":memory:":
+                conn.execute("PRAGMA journal_mode=WAL")
+                conn.execute("PRAGMA synchronous=NORMAL")
+            conn.executescript(SCHEMA)
+        except sqlite3.Error:
+            conn.close()
+            raise
+        return conn
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    # === STATE ===
+    def get(self, key, default=None):
+        with self._lock:
+            row = self._conn.execute("SELECT value FROM state WHERE key = ?", (key,)).fetchone()
+        return json.loads(row[0]) if row else default
+
+    def put(self, key, value):
+        with self._lock, self._conn:
+            self._conn.execute("INSERT OR REPLACE INTO state VALUES (?, ?)", (key, json.dumps(value)))
+
+    # === PRESETS ===
+    def presets(self):
+        # {name: (modes, min_rating, max_rating)}
+        with self._lock:
+            rows = self._conn.execute("SELECT * FROM presets ORDER BY name").fetchall()
+        return {name: (modes.split(","), lo, float('inf') if hi is None else hi)
+                for name, modes, lo, hi in rows}
+
+    def save_preset(self, name, flt):
+        hi = None if flt.max_rating == float('inf') else flt.max_rating
+        with self._lock, self._conn:
+            self._conn.execute("INSERT OR REPLACE INTO presets VALUES (?, ?, ?, ?)",
+                               (name, ",".join(sorted(flt.modes)), flt.min_rating, hi))
+
+    def delete_preset(self, name):
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM presets WHERE name = ?", (name,))
+
+    # === SHOWN MAPS ===
+    def log_shown(self, r):
+        with self._lock, self._conn:
+            seq = self._conn.execute(
+                "INSERT INTO shown (shown_at, set_id, beatmap_id, title, url, thumb) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (time.time(), r.set_id, r.beatmap_id, r.display_title, r.url, r.thumb)).lastrowid
+            if seq % 100 == 0:
+                self._conn.execute("DELETE FROM shown WHERE seq <= ?", (seq - SHOWN_KEEP,))
+
+    def recent_shown(self, n=20):
+        # [(shown_at, set_id, beatmap_id, title, url, thumb)], newest first
+        with self._lock:
+            return self._conn.execute(
+                "SELECT shown_at, set_id, beatmap_id, title, url, thumb FROM shown "
+                "ORDER BY seq DESC LIMIT ?", (n,)).fetchall()
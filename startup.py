@@ -0,0 +1,56 @@
+import threading
+import time
+
+from metrics import metrics
+
+# === TIMING ===
+# Seconds since this module was first imported (the first thing the GUI does),
+# recorded as startup_seconds{stage}: "paint" once the window is drawn, "ready"
+# once the search engine is loaded and searches can start, "connected" and
+# "token" once the warm-up below is done.
+STARTED = time.perf_counter()
+
+
+def mark(stage):
+    elapsed = time.perf_counter() - STARTED
+    metrics.observe("startup_seconds", elapsed, stage=stage)
+    return elapsed
+
+
+# === WARM-UP ===
+# Builds the searcher on a background thread after the first paint, so requests,
+# PIL and the on-disk caches load while the user sets filters. Once it is ready
+# it opens a pooled connection to the API host and fetches the OAuth token, so
+# the first search doesn't pay for the TLS handshake or the token POST.
+class WarmUp:
+    def __init__(self, build, on_ready, on_error=None):
+        # build() -> Searcher, runs on the warm-up thread;
+        # on_ready(searcher) is called from that thread as soon as it returns,
+        # on_error(exc) instead if it raises
+        self.build = build
+        self.on_ready = on_ready
+        self.on_error = on_error
+        self.error = None
+        self.ready = threading.Event()
+        self.searcher = None
+
+    def start(self):
+        threading.Thread(target=self._run, name="warm-up", daemon=True).start()
+
+    def _run(self):
+        try:
+            self.searcher = self.build()
+        except Exception as exc:
+            self.error = exc
+            metrics.inc("startup_errors_total")
+            if self.on_error:
+                self.on_error(exc)
+            return
+        mark("ready")
+        self.ready.set()
+        self.on_ready(self.searcher)
+        import fetch_engine
+        fetch_engine.warm_up()
+        mark("connected")
+        if self.searcher.offline is None and self.searcher.get_osu_token():
+            mark("token")
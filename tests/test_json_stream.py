@@ -0,0 +1,97 @@
+import json
+import os
+import sys
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+import requests
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from json_stream import DRAIN_LIMIT, iter_members, read_head, release  # noqa: E402
+
+DOCS = [
+    '{"a": 1.5, "status": "ranked", "b": 2}',
+    '{"e": -2.5e+10, "f": 3E2, "g": 0, "status": "loved"}',
+    '{"n": [1, {"x": 3e-2}], "s": "h\\u00e9\\"}", "t": true, "z": null}',
+    ' { "a" : 12345 , "b" : 6.25 } ',
+    '{}',
+]
+
+
+@pytest.mark.parametrize("doc", DOCS)
+def test_every_split_point(doc):
+    for i in range(len(doc) + 1):
+        assert dict(iter_members([doc[:i], doc[i:]])) == json.loads(doc), i
+
+
+@pytest.mark.parametrize("doc", DOCS)
+def test_every_pair_of_split_points(doc):
+    for i in range(len(doc) + 1):
+        for j in range(i, len(doc) + 1):
+            chunks = [doc[:i], doc[i:j], doc[j:]]
+            assert dict(iter_members(chunks)) == json.loads(doc), (i, j)
+
+
+def test_stops_early():
+    members = iter_members(['{"status": "graveyard", ', '"beatmaps": [broken'])
+    assert next(members) == ("status", "graveyard")
+
+
+@pytest.mark.parametrize("doc", ['{"a": 1.', '{"a": 1', '[1, 2]', '{"a" 1}'])
+def test_rejects_truncated_or_malformed(doc):
+    with pytest.raises(ValueError):
+        dict(iter_members([doc]))
+
+
+class _Chunked(BaseHTTPRequestHandler):
+    # GET /<n>: a chunked JSON object with "status" first and n bytes of padding
+    protocol_version = "HTTP/1.1"
+    connections = 0
+
+    def setup(self):
+        super().setup()
+        type(self).connections += 1
+
+    def do_GET(self):
+        body = ('{"status": "graveyard", "pad": "%s"}' % ("x" * int(self.path[1:]))).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        try:
+            for i in range(0, len(body), 4096):
+                chunk = body[i:i + 4096]
+                self.wfile.write(b"%x\r\n%s\r\n" % (len(chunk), chunk))
+            self.wfile.write(b"0\r\n\r\n")
+        except OSError:
+            self.close_connection = True
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def chunked_server():
+    _Chunked.connections = 0
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _Chunked)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{server.server_address[1]}"
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.mark.parametrize("size, connections", [(1000, 1), (DRAIN_LIMIT * 16, 2)])
+def test_release_chunked(chunked_server, size, connections):
+    # short chunked bodies are drained and the connection reused; long ones
+    # are cut off instead of being downloaded
+    with requests.Session() as session:
+        for _ in range(2):
+            res = session.get(f"{chunked_server}/{size}", stream=True, timeout=5)
+            assert res.raw.length_remaining is None
+            head, _ = read_head(res, "status")
+            assert head == {"status": "graveyard"}
+            release(res)
+    assert _Chunked.connections == connections
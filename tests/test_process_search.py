@@ -0,0 +1,50 @@
+import json
+import os
+import socket
+import subprocess
+import sys
+import time
+
+import pytest
+
+ROOT = os.path.join(os.path.dirname(__file__), "..")
+
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+@pytest.fixture
+def mock_api():
+    port = _free_port()
+    server = subprocess.Popen(
+        [sys.executable, os.path.join(ROOT, "bench", "mock_osu_server.py"), "--port", str(port),
+         "--hit-ratio", "0.1", "--latency", "uniform:0.01:0.03"],
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    deadline = time.monotonic() + 10
+    while True:
+        try:
+            socket.create_connection(("127.0.0.1", port), timeout=0.5).close()
+            break
+        except OSError:
+            if time.monotonic() > deadline:
+                server.kill()
+                pytest.fail("mock API did not start")
+            time.sleep(0.1)
+    yield f"http://127.0.0.1:{port}"
+    server.kill()
+    server.wait()
+
+
+def test_processes_reach_count(mock_api, tmp_path):
+    # enough maps that the workers exhaust what their index started with
+    env = dict(os.environ, OSU_BASE_URL=mock_api, OSU_CLIENT_ID="1", OSU_CLIENT_SECRET="x")
+    proc = subprocess.run(
+        [sys.executable, os.path.join(ROOT, "orb_search.py"), "-n", "60", "--processes", "2"],
+        cwd=tmp_path, env=env, capture_output=True, text=True, timeout=120)
+    assert proc.returncode == 0, proc.stderr
+    maps = [json.loads(line) for line in proc.stdout.splitlines()]
+    assert len(maps) == 60
+    assert len({m["set_id"] for m in maps}) == 60
@@ -0,0 +1,116 @@
+import hashlib
+import json
+import os
+import threading
+import time
+
+import requests
+
+from fetch_engine import session
+
+# === CONFIG ===
+CACHE_DIR = "thumb_cache"
+MAX_CACHE_BYTES = 100 * 1024 * 1024
+# cover URLs carry a ?timestamp that changes with the image, so entries stay
+# fresh for a long time and are only revalidated (If-None-Match) after that
+FRESH_FOR = 7 * 24 * 60 * 60
+
+
+# === CACHE ===
+# Content-addressed cover cache: blobs are stored under the sha1 of their bytes,
+# index.json maps url -> {"hash", "etag", "checked"}. File mtimes double as the
+# LRU clock; the least recently used blobs go once the cache exceeds max_bytes.
+class ThumbnailCache:
+    def __init__(self, path=CACHE_DIR, max_bytes=MAX_CACHE_BYTES):
+        self.path = path
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._entries = {}
+        try:
+            with open(os.path.join(path, "index.json"), "r") as f:
+                self._entries = json.load(f)
+        except (OSError, ValueError):
+            pass
+
+    def _blob(self, digest):
+        return os.path.join(self.path, digest)
+
+    def _read(self, digest):
+        try:
+            with open(self._blob(digest), "rb") as f:
+                data = f.read()
+            os.utime(self._blob(digest))
+            return data
+        except OSError:
+            return None
+
+    def _save_index(self):
+        tmp = os.path.join(self.path, "index.json.tmp")
+        with open(tmp, "w") as f:
+            json.dump(self._entries, f)
+        os.replace(tmp, os.path.join(self.path, "index.json"))
+
+    def _store(self, url, data, etag):
+        digest = hashlib.sha1(data).hexdigest()
+        with self._lock:
+            try:
+                os.makedirs(self.path, exist_ok=True)
+                if not os.path.exists(self._blob(digest)):
+                    with open(self._blob(digest), "wb") as f:
+                        f.write(data)
+                self._entries[url] = {"hash": digest, "etag": etag, "checked": time.time()}
+                self._evict()
+                self._save_index()
+            except OSError:
+                pass
+
+    def _evict(self):
+        blobs = []
+        for name in os.listdir(self.path):
+            if name.startswith("index.json"):
+                continue
+            st = os.stat(self._blob(name))
+            blobs.append((st.st_mtime, st.st_size, name))
+        total = sum(size for _, size, _ in blobs)
+        if total <= self.max_bytes:
+            return
+        gone = set()
+        for _, size, name in sorted(blobs):
+            if total <= self.max_bytes:
+                break
+            os.remove(self._blob(name))
+            gone.add(name)
+            total -= size
+        self._entries = {u: e for u, e in self._entries.items() if e["hash"] not in gone}
+
+    def get(self, url):
+        return self.fetch(url)[0]
+
+    def fetch(self, url):
+        # (bytes or None, how they were obtained: fresh / revalidated / network /
+        # stale when the server was unreachable / error)
+        if not url:
+            return None, "error"
+        with self._lock:
+            entry = self._entries.get(url)
+        data = self._read(entry["hash"]) if entry else None
+        if data is not None and time.time() - entry["checked"] < FRESH_FOR:
+            return data, "fresh"
+        headers = {}
+        if data is not None and entry.get("etag"):
+            headers["If-None-Match"] = entry["etag"]
+        try:
+            r = session.get(url, headers=headers, timeout=10)
+            if r.status_code == 304 and data is not None:
+                with self._lock:
+                    entry["checked"] = time.time()
+                    try:
+                        self._save_index()
+                    except OSError:
+                        pass
+                return data, "revalidated"
+            r.raise_for_status()
+        except requests.RequestException:
+            return data, "stale" if data is not None else "error"
+        self._store(url, r.content, r.headers.get("ETag"))
+        return r.content, "network"
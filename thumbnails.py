@@ -0,0 +1,32 @@
+import io
+from concurrent.futures import ThreadPoolExecutor
+
+from PIL import Image
+
+from metrics import metrics
+
+# === CONFIG ===
+THUMB_SIZE = (450, 300)
+DECODE_WORKERS = 2
+
+_pool = ThreadPoolExecutor(max_workers=DECODE_WORKERS, thread_name_prefix="thumb")
+
+
+def decode(data, size=THUMB_SIZE):
+    # bytes -> resized PIL image, safe to call off the Tk thread; only the
+    # ImageTk.PhotoImage conversion has to happen on the UI thread
+    if not data:
+        return None
+    with metrics.span("thumbnail_decode") as span:
+        try:
+            img = Image.open(io.BytesIO(data))
+            img.thumbnail(size, Image.Resampling.LANCZOS)
+            return img
+        except (OSError, ValueError):
+            span.outcome = "error"
+            return None
+
+
+def load_async(fetch, url, size=THUMB_SIZE):
+    # fetch (cache or network) + decode + resize on the worker pool; returns a Future
+    return _pool.submit(lambda: decode(fetch(url), size))
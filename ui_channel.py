@@ -0,0 +1,31 @@
+import queue
+
+# === CONFIG ===
+POLL_MS = 30
+
+
+# === CHANNEL ===
+# The only way worker threads talk to the Tk UI. Workers post(fn, *args) into a
+# thread-safe queue; the Tk thread drains it every POLL_MS and runs the calls,
+# so no Tk widget or variable is ever touched off the main thread (root.after
+# included) and workers never block on the UI.
+class UiChannel:
+    def __init__(self, root, poll_ms=POLL_MS):
+        self.root = root
+        self.poll_ms = poll_ms
+        self._queue = queue.SimpleQueue()
+        root.after(poll_ms, self._drain)
+
+    def post(self, fn, *args):
+        # callable from any thread
+        self._queue.put((fn, args))
+
+    def _drain(self):
+        try:
+            while True:
+                fn, args = self._queue.get_nowait()
+                fn(*args)
+        except queue.Empty:
+            pass
+        finally:
+            self.root.after(self.poll_ms, self._drain)